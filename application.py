@@ -34,7 +34,18 @@ class Application:
 		if we should print debug messages or not
 	Methods
 	-------
+	update_runtime(ion, time)
+		registers an observed runtime
+	estimate_runtime(method)
+		fills runtime from the observations
+	set_runtime(runtime)
+		fills runtime with already estimated values
 	"""
+	#there are only a few applications, but they are accessed at
+	#every event of the simulations (and used as dict keys), so 
+	#they have no __dict__
+	__slots__ = ("app", "nodes", "procs", "runtime", "observations", "best_time", "worst_time", "debug")
+
 	def __init__(self,app, nodes, procs, debug):
 		self.app = app
 		self.nodes = nodes
@@ -78,6 +89,17 @@ class Application:
 				print(method+" runtime for "+str(self)+" with "+str(ion)+" I/O nodes: "+str(self.runtime[ion]))
 		self.best_time = min(list(self.runtime.values()))
 		self.worst_time = max(list(self.runtime.values()))
+
+	def set_runtime(self, runtime):
+		"""
+		Sets the expected runtime with each number of I/O nodes
+		(a dict {int, float}) when it was already estimated 
+		(see catalog.py), instead of using update_runtime and
+		estimate_runtime. Also find best_time and worst_time.
+		"""
+		self.runtime = dict(runtime)
+		self.best_time = min(list(self.runtime.values()))
+		self.worst_time = max(list(self.runtime.values()))
 	
 	def get_time(self, which):
 		if which == "best":
@@ -92,3 +114,40 @@ class Application:
 
 	def __str__(self):
 		return "("+self.app+", "+str(self.nodes)+" nodes, "+str(self.procs)+" procs)"
+
+#reads information from the file (see runtime.csv) and returns a list
+#of Application objects containing the information. summary_method
+#tells how to combine multiple executions of the same configuration
+#(see Application.estimate_runtime)
+def read_runtime(filename, summary_method="median", debug=False):
+	arq = open(filename, "r")
+	contents = arq.readlines()
+	arq.close()
+	existing = {} #used to make sure each application is created
+		#only once. relates (app, nodes, procs) to the 
+		#corresponding Application object
+	for line in contents:
+		if "forwarders" in line:
+			continue #skip the header
+		#obtain information from the line
+		parsed= line.split('\n')[0].split(';')
+		if debug:
+			print(parsed)
+		assert len(parsed) == 7
+		app = parsed[3]
+		nodes = int(parsed[1])
+		procs = int(parsed[2])
+		size = (nodes, procs)
+		ion = int(parsed[0])
+		time = float(parsed[5])
+		#store it
+		if not (app, nodes, procs) in existing:
+			new_app = Application(app, nodes, procs, debug)
+			existing[(app, nodes, procs)] = new_app
+		existing[(app, nodes, procs)].update_runtime(ion, time)
+	#call the estimate_runtime method of all Application objects to
+	#calculate the median execution time from all the observations
+	#registered with the update_runtime method just above
+	for app in existing:
+		existing[app].estimate_runtime(summary_method)
+	return list(existing.values())
@@ -30,3 +30,8 @@ def encode_application(app):
     else:
         print(app.app)
         assert False
+
+#returns the encoding of a queue (a list of Application objects) as a 
+#string with the letter of each application, in order
+def encode_queue(queue):
+    return "".join([encode_application(app) for app in queue])
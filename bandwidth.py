@@ -1,6 +1,7 @@
 import os
 import csv
-import pprint
+
+import numpy
 
 from application import Application
 from application_encode import encode_application
@@ -10,53 +11,202 @@ class Bandwidth():
     """
     Used to access the bandwidth estimations for applications
     with different numbers of I/O nodes
+
+    The database is compiled at load time into a dense matrix with
+    one row per application (identified by its letter, number of
+    clients and number of processes) and one column per number of
+    I/O nodes (forwarders). Entries that are not in the database are
+    NaN.
+
+    Attributes
+    ----------
+    matrix : numpy.ndarray
+        the bandwidth of each application (row) with each number
+        of forwarders (column)
+    table : List[List[float]]
+        the same as matrix, as Python lists (faster to access one
+        element at a time)
+    forwarders : List[int]
+        the number of forwarders of each column, in increasing
+        order
+    forwarder_index : dict {int, int}
+        relates a number of forwarders to its column
+    rows : dict {(str, int, int), int}
+        relates (scenario, clients, processes) from the database
+        to its row
+    app_ids : dict {(str, int, int), int}
+        cache relating (app, nodes, procs) of an application to
+        its row, filled as applications are looked up
+    options : dict {(str, int, int), (numpy.ndarray, numpy.ndarray)}
+        cache of get_options, by (app, nodes, procs)
+    app_rows : dict {Application, List[float]}
+        cache relating Application objects to their row of table,
+        used by get_many (which is called at every event of the
+        simulations)
     """
 
     DB_BANDWIDTH_FILE = 'bandwidth.csv'
 
-    def __init__(self):
-        """Load the database of access patterns and performance metrics."""
+    def __init__(self, compiled=None):
+        """
+        Load the database of access patterns and performance metrics.
+
+        compiled is an optional (rows, forwarders, matrix) with the
+        database already compiled (see catalog.py), in which case
+        the file is not read.
+        """
+
+        if compiled is not None:
+            self.rows, self.forwarders, self.matrix = compiled
+            self.forwarders = list(self.forwarders)
+        else:
+            self.rows, self.forwarders, self.matrix = self.read_database()
+        self.forwarder_index = {forwarders: column for column, forwarders in enumerate(self.forwarders)}
+        self.table = self.matrix.tolist()
+        self.app_ids = {}
+        self.options = {}
+        self.app_rows = {}
+
+        print('loaded database of bandwidths')
 
-        self.bandwidth = {}
+    def read_database(self):
+        """
+        Parses DB_BANDWIDTH_FILE and returns (rows, forwarders, matrix)
+        """
 
         if not os.path.isfile(self.DB_BANDWIDTH_FILE):
             print('unable to find the bandwidth database file')
 
             exit()
 
+        entries = {}
         with open(self.DB_BANDWIDTH_FILE, 'r') as csv_file:
             rows = csv.DictReader(csv_file, delimiter=';')
 
             for row in rows:
-                if row['scenario'] not in self.bandwidth:
-                    self.bandwidth[row['scenario']] = dict()
+                key = (row['scenario'], int(row['clients']), int(row['processes']))
+                forwarders = int(row['forwarders'])
+                if (key, forwarders) not in entries:
+                    entries[(key, forwarders)] = float(row['bandwidth'])
+
+        rows = {}
+        for key, forwarders in entries:
+            if key not in rows:
+                rows[key] = len(rows)
+        forwarders = sorted(set([forwarders for key, forwarders in entries]))
+        forwarder_index = {number: column for column, number in enumerate(forwarders)}
+        matrix = numpy.full((len(rows), len(forwarders)), numpy.nan)
+        for (key, number), bandwidth in entries.items():
+            matrix[rows[key], forwarder_index[number]] = bandwidth
+        return rows, forwarders, matrix
+
+    def get_app_id(self, app, nodes, procs):
+        """
+        returns the row of the matrix with the bandwidth of the
+        application app (name as in the results-runtime.csv file)
+        with nodes nodes and procs processes
+        """
+        try:
+            return self.app_ids[(app, nodes, procs)]
+        except KeyError:
+            pass
+        #we need to pass the same structe to the encode application function
+        application = Application(app, nodes, procs, False)
+        try:
+            app_id = self.rows[(encode_application(application), nodes, procs)]
+        except KeyError as e:
+            print('unable to find the bandwidth for: {} ({}) {} {}'.format(app, encode_application(application), nodes, procs))
 
-                if row['clients'] not in self.bandwidth[row['scenario']]:
-                    self.bandwidth[row['scenario']][row['clients']] = dict()
+            exit()
+        self.app_ids[(app, nodes, procs)] = app_id
+        return app_id
 
-                if row['processes'] not in self.bandwidth[row['scenario']][row['clients']]:
-                    self.bandwidth[row['scenario']][row['clients']][row['processes']] = dict()
+    def missing(self, app, nodes, procs, ion):
+        print('unable to find the bandwidth for: {} ({}) {} {} {}'.format(app, encode_application(Application(app, nodes, procs, False)), nodes, procs, ion))
 
-                if row['forwarders'] not in self.bandwidth[row['scenario']][row['clients']][row['processes']]:
-                    self.bandwidth[row['scenario']][row['clients']][row['processes']][row['forwarders']] = float(row['bandwidth'])
+        exit()
 
-        print('loaded database of bandwidths')
-    
     def get(self, app, nodes, procs, ion):
-        """ 
-        given the name of the application app (as in the 
+        """
+        given the name of the application app (as in the
         results-runtime.csv file, the number of nodes, the
         number of processes procs, and the number of I/O nodes
         ion, retuns the bandwidth
         """
-        #we need to pass the same structe to the encode application function
-        application = Application(app, nodes, procs, False)
-        #print("->", encode_application(application))
-
-        #pprint.pprint(self.bandwidth)
+        row = self.table[self.get_app_id(app, nodes, procs)]
         try:
-            return self.bandwidth[encode_application(application)][str(nodes)][str(procs)][str(ion)]
+            bandwidth = row[self.forwarder_index[ion]]
         except KeyError as e:
-            print('unable to find the bandwidth for: {} ({}) {} {} {}'.format(app, encode_application(application), nodes, procs, ion))
+            self.missing(app, nodes, procs, ion)
+        if bandwidth != bandwidth:
+            #NaN, we do not have this one
+            self.missing(app, nodes, procs, ion)
+        return bandwidth
 
-            exit()
+    def get_vector(self, application, forwarders=None):
+        """
+        given an Application object, returns a numpy array with
+        its bandwidth with each number of I/O nodes listed in
+        forwarders (by default, all of the forwarders list)
+        """
+        row = self.get_app_id(application.app, application.nodes, application.procs)
+        if forwarders is None:
+            vector = self.matrix[row]
+        else:
+            try:
+                vector = self.matrix[row, [self.forwarder_index[ion] for ion in forwarders]]
+            except KeyError as e:
+                self.missing(application.app, application.nodes, application.procs, e.args[0])
+        if numpy.isnan(vector).any():
+            if forwarders is None:
+                forwarders = self.forwarders
+            self.missing(application.app, application.nodes, application.procs, forwarders[numpy.isnan(vector).argmax()])
+        return vector
+
+    def get_options(self, application):
+        """
+        given an Application object, returns (forwarders, bandwidths),
+        two numpy arrays with the numbers of I/O nodes (at least 1,
+        in increasing order) that can be given to it, because we
+        know both its bandwidth and its runtime with them, and the
+        bandwidth with each of them
+        """
+        key = (application.app, application.nodes, application.procs)
+        try:
+            return self.options[key]
+        except KeyError:
+            pass
+        row = self.matrix[self.get_app_id(application.app, application.nodes, application.procs)]
+        columns = [column for column, ion in enumerate(self.forwarders) if (ion > 0) and (ion in application.runtime) and (not numpy.isnan(row[column]))]
+        if len(columns) == 0:
+            self.missing(application.app, application.nodes, application.procs, "any")
+        self.options[key] = (numpy.array([self.forwarders[column] for column in columns]), row[columns])
+        return self.options[key]
+
+    def get_many(self, job_list, decision):
+        """
+        given a list of Job objects and a dict {Job, int} with
+        the number of I/O nodes of each of them, returns a list
+        with the bandwidth of each job (in the order of
+        job_list)
+        """
+        #there are only a few jobs, so indexing the lists of table
+        #one at a time is faster than indexing the matrix with
+        #arrays
+        bandwidths = []
+        for job in job_list:
+            app = job.app
+            try:
+                row = self.app_rows[app]
+            except KeyError:
+                row = self.table[self.get_app_id(app.app, app.nodes, app.procs)]
+                self.app_rows[app] = row
+            column = self.forwarder_index.get(decision[job])
+            if column is None:
+                self.missing(app.app, app.nodes, app.procs, decision[job])
+            bandwidth = row[column]
+            if bandwidth != bandwidth:
+                #NaN, we do not have this one
+                self.missing(app.app, app.nodes, app.procs, decision[job])
+            bandwidths.append(bandwidth)
+        return bandwidths
@@ -0,0 +1,293 @@
+import numpy
+from application_encode import encode_application
+from decision_table import DecisionTable
+from metrics import Metrics
+
+#the policies simulate_batch can apply
+BATCH_POLICIES = ["baseline", "mckp", "sparse_mckp"]
+
+#simulates many queues at once, giving the same Metrics as calling
+#simulate_execution_with_policy for each of them (see
+#policy_simulation.py).
+#Instead of Job objects, the state of all simulations is kept in numpy
+#arrays (struct of arrays): the clock, the number of available nodes and
+#the next application of each queue, and, for each queue, a fixed number
+#of slots for running jobs with their application, progress, current
+#number of I/O nodes, and the clock of their last update. At each step,
+#every simulation that is not over advances by one event (scheduling,
+#applying the policy, and going to the end of the next job), with the
+#same floating point operations done by Job, so the results are
+#identical.
+#The baseline policy is applied as a vectorized rule. The decisions of
+#the mckp policy are looked up in a DecisionTable for each distinct set
+#of running applications. If none is given, a lazy one is made for this
+#call, so each set that happens is solved once.
+#queues is a list of queues, each a list of Application objects (as
+#Queue.jobs). Returns a list with one Metrics object per queue.
+def simulate_batch(queues, node_nb, ion_nb, policy, bandwidth_getter, decision_table=None, exact_durations=False):
+	assert policy in BATCH_POLICIES
+	#give an integer id to each application
+	apps = []
+	app_ids = {}
+	for queue in queues:
+		for app in queue:
+			if not (id(app) in app_ids):
+				app_ids[id(app)] = len(apps)
+				apps.append(app)
+	app_nb = len(apps)
+	app_nodes = numpy.array([app.nodes for app in apps], dtype=numpy.int64)
+	#runtime of each application with each number of I/O nodes
+	ion_values = sorted(set([ion for app in apps for ion in app.runtime]))
+	ion_column = numpy.full(max(ion_values) + 1, -1, dtype=numpy.int64)
+	ion_column[ion_values] = numpy.arange(len(ion_values))
+	runtime = numpy.full((app_nb, len(ion_values)), numpy.nan)
+	for app_id,app in enumerate(apps):
+		for ion in app.runtime:
+			runtime[app_id, ion_column[ion]] = app.runtime[ion]
+	#the queues, padded with -1
+	queue_nb = len(queues)
+	lengths = numpy.array([len(queue) for queue in queues], dtype=numpy.int64)
+	max_length = max(1, lengths.max())
+	encoded = numpy.full((queue_nb, max_length + 1), -1, dtype=numpy.int64)
+	for i,queue in enumerate(queues):
+		encoded[i, :len(queue)] = [app_ids[id(app)] for app in queue]
+	#the state of the simulations
+	slot_nb = node_nb // app_nodes.min()
+	rows = numpy.arange(queue_nb)
+	clock = numpy.zeros(queue_nb)
+	available_nodes = numpy.full(queue_nb, node_nb, dtype=numpy.int64)
+	head = numpy.zeros(queue_nb, dtype=numpy.int64)
+	next_jobid = numpy.zeros(queue_nb, dtype=numpy.int64)
+	slot_app = numpy.full((queue_nb, slot_nb), -1, dtype=numpy.int64)
+	slot_jobid = numpy.zeros((queue_nb, slot_nb), dtype=numpy.int64)
+	slot_ion = numpy.full((queue_nb, slot_nb), -1, dtype=numpy.int64)
+	slot_done = numpy.zeros((queue_nb, slot_nb))
+	slot_previous = numpy.zeros((queue_nb, slot_nb))
+	active = lengths > 0
+	#what is given to the metrics at each policy call
+	calls = numpy.zeros(queue_nb, dtype=numpy.int64)
+	changes = numpy.zeros(queue_nb, dtype=numpy.int64)
+	event_clock = numpy.zeros((queue_nb, max_length))
+	event_bandwidth = numpy.zeros((queue_nb, max_length))
+	event_njobs = numpy.zeros((queue_nb, max_length), dtype=numpy.int64)
+	if policy != "baseline":
+		if decision_table is None:
+			decision_table = DecisionTable(apps, node_nb, ion_nb, bandwidth_getter, policy=policy, lazy=True)
+		letters = [encode_application(app) for app in apps]
+	else:
+		#the baseline has a fixed number of I/O nodes per
+		#application
+		assert ((ion_nb*app_nodes) % node_nb == 0).all()
+		baseline_ion = (ion_nb*app_nodes) // node_nb
+		assert (baseline_ion > 0).all()
+		app_bandwidth = numpy.array([bandwidth_getter.get(app.app, app.nodes, app.procs, baseline_ion[app_id]) for app_id,app in enumerate(apps)])
+	while active.any():
+		#first we try to schedule jobs
+		while True:
+			next_app = encoded[rows, head]
+			can_schedule = active & (next_app >= 0) & (app_nodes[next_app] <= available_nodes)
+			if not can_schedule.any():
+				break
+			which = rows[can_schedule]
+			slot = numpy.argmax(slot_app[which] < 0, axis=1)
+			slot_app[which, slot] = next_app[which]
+			slot_jobid[which, slot] = next_jobid[which]
+			slot_ion[which, slot] = -1
+			slot_done[which, slot] = 0.0
+			slot_previous[which, slot] = clock[which]
+			next_jobid[which] += 1
+			available_nodes[which] -= app_nodes[next_app[which]]
+			head[which] += 1
+		#now apply the policy to the active simulations
+		which = rows[active]
+		apps_now = slot_app[which]
+		running = apps_now >= 0
+		#running jobs in the order they were scheduled (empty
+		#slots at the end)
+		order = numpy.argsort(numpy.where(running, slot_jobid[which], numpy.iinfo(numpy.int64).max), axis=1, kind="stable")
+		if policy == "baseline":
+			ion = numpy.where(running, baseline_ion[apps_now], -1)
+			band = numpy.where(running, app_bandwidth[apps_now], 0.0)
+		else:
+			ion, band = lookup_decisions(decision_table, apps, letters, apps_now, running, slot_jobid[which])
+		#global bandwidth, summed in the order of the jobs
+		sorted_band = numpy.take_along_axis(band, order, axis=1)
+		global_band = numpy.zeros(len(which))
+		for column in range(slot_nb):
+			global_band = global_band + sorted_band[:, column]
+		#metrics of this policy call
+		previous_ion = slot_ion[which]
+		changed = (running & (previous_ion >= 0) & (previous_ion != ion)).any(axis=1)
+		changes[which] += (changed & (calls[which] > 0))
+		event_clock[which, calls[which]] = clock[which]
+		event_bandwidth[which, calls[which]] = global_band
+		event_njobs[which, calls[which]] = running.sum(axis=1)
+		calls[which] += 1
+		#update the progress of the running jobs with their
+		#previous number of I/O nodes, then give them the new
+		#ones (as Job.update_io_nodes)
+		now = clock[which][:, None]
+		previous = slot_previous[which]
+		done = slot_done[which]
+		progress = running & (previous_ion >= 0) & (now > previous)
+		old_runtime = runtime[numpy.where(running, apps_now, 0), ion_column[numpy.maximum(previous_ion, 0)]]
+		done = numpy.where(progress, done + (now - previous)/old_runtime, done)
+		new_runtime = runtime[numpy.where(running, apps_now, 0), ion_column[numpy.maximum(ion, 0)]]
+		assert not numpy.isnan(new_runtime[running]).any()
+		slot_done[which] = done
+		slot_previous[which] = numpy.where(running, now, previous)
+		slot_ion[which] = ion
+		#go to the moment when the next jobs end
+		end_time = numpy.where(running, now + ((1.0 - done)*new_runtime), numpy.inf)
+		new_clock = end_time.min(axis=1)
+		for i in numpy.nonzero(new_clock <= clock[which])[0]:
+			print("WARNING! The simulation is going from "+str(clock[which[i]])+" to "+str(new_clock[i]))
+		clock[which] = new_clock
+		ended = running & (end_time == new_clock[:, None])
+		available_nodes[which] += (numpy.where(ended, app_nodes[apps_now], 0)).sum(axis=1)
+		slot_app[which] = numpy.where(ended, -1, apps_now)
+		active[which] = (head[which] < lengths[which]) | (slot_app[which] >= 0).any(axis=1)
+	return make_metrics(exact_durations, event_clock, event_bandwidth, event_njobs, calls, changes, clock)
+
+#returns the numbers of I/O nodes given by the mckp policy (looked up
+#in decision_table) and the bandwidth of each running job. apps_now has
+#the application of each slot of each simulation (as an index of apps,
+#whose letters are in letters), running says which slots have a running
+#job, and jobids is used to know the order of the jobs, since that tells
+#which one of multiple jobs running the same application receives each
+#decision (see DecisionTable). Sets missing from a lazy decision_table
+#are solved
+def lookup_decisions(decision_table, apps, letters, apps_now, running, jobids):
+	queue_nb, slot_nb = apps_now.shape
+	app_nb = len(apps)
+	#position of each job among the running jobs of the same
+	#application
+	same_app = (apps_now[:, :, None] == apps_now[:, None, :]) & running[:, None, :]
+	rank = (same_app & (jobids[:, None, :] < jobids[:, :, None])).sum(axis=2)
+	#the distinct sets of running applications
+	counts = numpy.zeros((queue_nb, app_nb), dtype=numpy.int64)
+	numpy.add.at(counts, (numpy.repeat(numpy.arange(queue_nb), slot_nb)[running.ravel()], apps_now[running]), 1)
+	sets, inverse = numpy.unique(counts, axis=0, return_inverse=True)
+	inverse = inverse.ravel()
+	set_ion = numpy.full((len(sets), app_nb, slot_nb), -1, dtype=numpy.int64)
+	set_band = numpy.zeros((len(sets), app_nb, slot_nb))
+	for set_id,count in enumerate(sets):
+		key = "".join(sorted([letters[app_id]*count[app_id] for app_id in range(app_nb)]))
+		if (not (key in decision_table.decisions)) and (decision_table.bandwidth_getter is not None):
+			present = sorted(numpy.nonzero(count)[0], key=lambda app_id: letters[app_id])
+			decision_table.misses += 1
+			decision_table.solve([apps[app_id] for app_id in present for i in range(count[app_id])], decision_table.bandwidth_getter)
+		by_letter = decision_table.decisions[key]
+		for app_id in numpy.nonzero(count)[0]:
+			for position,(ion, band) in enumerate(by_letter[letters[app_id]]):
+				set_ion[set_id, app_id, position] = ion
+				set_band[set_id, app_id, position] = band
+	safe_apps = numpy.where(running, apps_now, 0)
+	ion = numpy.where(running, set_ion[inverse[:, None], safe_apps, rank], -1)
+	band = numpy.where(running, set_band[inverse[:, None], safe_apps, rank], 0.0)
+	return ion, band
+
+#creates the Metrics objects of all simulations from what was registered
+#at their policy calls (the clock, global bandwidth and number of jobs 
+#of each call, padded to the same length, calls has the number of calls
+#of each simulation) and their final clock. The statistics are computed
+#for all simulations at once, but with the same operations done by 
+#Metrics.summarize_policy_metrics for each of them, so they are 
+#identical (and, as there, they do not keep the Bandwidth).
+def make_metrics(exact_durations, event_clock, event_bandwidth, event_njobs, calls, changes, clock):
+	queue_nb, max_calls = event_clock.shape
+	rows = numpy.arange(queue_nb)
+	columns = numpy.arange(max_calls)
+	#the last call lasts until the end of the simulation
+	last = calls - 1
+	ends = event_clock.copy()
+	ends[rows, last] = clock
+	in_call = columns[None, :] < calls[:, None]
+	period = numpy.diff(event_clock, axis=1)
+	period_nb = calls - 1
+	if exact_durations:
+		durations = numpy.where(in_call, ends - event_clock, 0.0)
+		durations[:, :-1] = numpy.where(columns[None, :-1] < last[:, None], period, durations[:, :-1])
+	else:
+		truncated = numpy.trunc(ends).astype(numpy.int64)
+		truncated[:, :-1] = numpy.where(columns[None, :-1] < last[:, None], numpy.trunc(event_clock[:, 1:]).astype(numpy.int64), truncated[:, :-1])
+		durations = numpy.where(in_call, truncated - numpy.trunc(event_clock).astype(numpy.int64), 0)
+	#the final period is only registered if the clock advanced
+	durations[rows, last] = numpy.where(clock > event_clock[rows, last], durations[rows, last], 0)
+	#keep only the runs with positive durations, in order, at the
+	#beginning of each row
+	kept = in_call & (durations > 0)
+	compact = numpy.argsort(~kept, axis=1, kind="stable")
+	run_nb = kept.sum(axis=1)
+	values = numpy.take_along_axis(event_bandwidth, compact, axis=1)
+	weights = numpy.take_along_axis(durations, compact, axis=1)
+	in_run = columns[None, :] < run_nb[:, None]
+	values = numpy.where(in_run, values, numpy.inf)
+	weights = numpy.where(in_run, weights, 0)
+	median_period = row_medians(period, period_nb)
+	mean_period = row_means(period, period_nb)
+	median_njobs = row_medians(event_njobs, calls)
+	mean_njobs = row_means(event_njobs, calls)
+	with numpy.errstate(invalid="ignore", divide="ignore"):
+		mean_bandwidth = row_sums(values*weights, run_nb)/row_sums(weights, run_nb)
+	max_bandwidth = numpy.where(in_run, values, -numpy.inf).max(axis=1)
+	#weighted medians (see weighted_median in metrics.py)
+	order = numpy.argsort(values, axis=1, kind="stable")
+	sorted_values = numpy.take_along_axis(values, order, axis=1)
+	cumulative = numpy.cumsum(numpy.take_along_axis(weights, order, axis=1), axis=1)
+	half = cumulative[:, -1]/2
+	low = numpy.minimum((cumulative < half[:, None]).sum(axis=1), max_calls - 1)
+	high = numpy.minimum((cumulative <= half[:, None]).sum(axis=1), max_calls - 1)
+	median_bandwidth = (sorted_values[rows, low] + sorted_values[rows, high])/2
+	ret = []
+	for i in range(queue_nb):
+		metrics = Metrics(None, exact_durations)
+		metrics.policy_calls = int(calls[i])
+		metrics.last_clock = event_clock[i, last[i]]
+		metrics.period = period[i, :period_nb[i]].tolist()
+		metrics.njobs = event_njobs[i, :calls[i]].tolist()
+		metrics.total_njobs = sum(metrics.njobs)
+		metrics.changes = int(changes[i])
+		metrics.last_decision = {}
+		metrics.bandwidth = values[i, :run_nb[i]].tolist()
+		metrics.bandwidth_durations = weights[i, :run_nb[i]].tolist()
+		metrics.previous_bandwidth = event_bandwidth[i, last[i]]
+		metrics.makespan = clock[i]
+		metrics.median_period = median_period[i]
+		metrics.mean_period = mean_period[i]
+		metrics.median_bandwidth = median_bandwidth[i]
+		metrics.mean_bandwidth = mean_bandwidth[i]
+		metrics.max_bandwidth = max_bandwidth[i]
+		metrics.median_njobs = median_njobs[i]
+		metrics.mean_njobs = mean_njobs[i]
+		ret.append(metrics)
+	return ret
+
+#returns the median of the first lengths[i] elements of each row i of
+#values
+def row_medians(values, lengths):
+	rows = numpy.arange(len(values))
+	padded = numpy.where(numpy.arange(values.shape[1])[None, :] < lengths[:, None], values, numpy.inf)
+	padded = numpy.sort(padded, axis=1)
+	low = numpy.maximum((lengths - 1)//2, 0)
+	high = numpy.maximum(lengths//2, 0)
+	with numpy.errstate(invalid="ignore"):
+		medians = (padded[rows, low] + padded[rows, high])/2
+	return numpy.where(lengths > 0, medians, numpy.nan)
+
+#returns the sum of the first lengths[i] elements of each row i of
+#values. Rows with the same length are summed together, so the sums are
+#done in the same order numpy would use for each row alone
+def row_sums(values, lengths):
+	sums = numpy.zeros(len(values), dtype=values.dtype)
+	for length in numpy.unique(lengths):
+		which = numpy.nonzero(lengths == length)[0]
+		sums[which] = values[which, :length].sum(axis=1)
+	return sums
+
+#returns the mean of the first lengths[i] elements of each row i of
+#values (as numpy.mean would do for each row alone)
+def row_means(values, lengths):
+	with numpy.errstate(invalid="ignore", divide="ignore"):
+		return row_sums(values.astype(numpy.float64), lengths)/lengths
+
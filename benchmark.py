@@ -0,0 +1,214 @@
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+from random import seed, randint
+import numpy
+from application import read_runtime
+from bandwidth import Bandwidth
+from job import Job
+from job_queue import make_a_queue, calculate_makespan
+from metrics import Metrics
+from policy import mckp_policy
+from policy_simulation import simulate_execution_with_policy
+from batch_simulation import simulate_batch
+from generate_queues import make_config, generate
+
+####### PARAMETERS #####
+input_file = "runtime.csv"  #with the path so we can find it
+output_file = "benchmark.json"  #where the results are written
+baseline_file = None #if given (a file previously written by this
+            #script), the results are compared to it and the
+            #script exits with an error if any benchmark got
+            #slower by more than tolerance
+tolerance = 0.10 #a benchmark is a regression if its best time is
+            #more than (1+tolerance) times the one in the baseline
+repeats = 5 #how many times each benchmark is timed
+min_repeat_time = 0.1 #short benchmarks are called in a loop so each
+            #timing takes at least this many seconds
+benchmark_seed = 42 #seed used to build the inputs of every benchmark,
+            #so they are the same from one run to the next
+mckp_job_nbs = [1, 2, 4, 8] #numbers of jobs given to mckp_policy
+mckp_ion_nbs = [8, 12, 16] #numbers of I/O nodes given to mckp_policy
+settings = [(96, 12, 900), (96, 12, 1800), (192, 24, 900), (192, 24, 1800)]
+            #the (node_nb, ion_nb, minimum_time) used by the
+            #simulation and generation benchmarks. The baseline
+            #policy must give each application a number of I/O
+            #nodes we have the bandwidth for (see baseline_policy)
+simulated_queue_nb = 5 #how many queues are simulated by the
+            #simulation benchmarks
+batch_queue_nb = 100 #how many queues are simulated together by the
+            #batch simulation benchmarks
+generated_queue_nb = 20 #how many queues are generated by the
+            #generation benchmarks
+########################
+
+#times function repeats times and returns the list of times of one
+#call, in seconds. Each timing calls function loop_nb times, with 
+#loop_nb chosen (as a power of 2) so it takes at least min_repeat_time
+def time_it(function):
+    loop_nb = 1
+    while True:
+        start = time.perf_counter()
+        for i in range(loop_nb):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_repeat_time:
+            break
+        loop_nb *= 2
+    times = [elapsed/loop_nb]
+    for i in range(repeats-1):
+        start = time.perf_counter()
+        for i in range(loop_nb):
+            function()
+        times.append((time.perf_counter() - start)/loop_nb)
+    return times
+
+#returns the entry of the results for a benchmark
+def make_result(params, times):
+    return {"params" : params,
+        "times" : times,
+        "min" : min(times),
+        "median" : float(numpy.median(times)),
+        "mean" : float(numpy.mean(times))}
+
+#returns a list of job_nb Job objects running random applications
+def make_jobs(apps, job_nb):
+    return [Job(jobid, 0.0, apps[randint(0, len(apps)-1)]) for jobid in range(job_nb)]
+
+def bench_calculate_makespan(apps, results):
+    for node_nb, ion_nb, minimum_time in settings:
+        seed(benchmark_seed)
+        queue = make_a_queue(apps, node_nb, minimum_time)
+        def run():
+            calculate_makespan(queue, node_nb, "best")
+            calculate_makespan(queue, node_nb, "worst")
+        name = "calculate_makespan/"+str(node_nb)+"/"+str(minimum_time)
+        results[name] = make_result({"node_nb" : node_nb, "minimum_time" : minimum_time, "njobs" : len(queue)}, time_it(run))
+
+def bench_mckp_policy(apps, band_getter, results):
+    for job_nb in mckp_job_nbs:
+        for ion_nb in mckp_ion_nbs:
+            if job_nb > ion_nb:
+                continue #every job needs at least one I/O node
+            seed(benchmark_seed)
+            job_lists = [make_jobs(apps, job_nb) for i in range(20)]
+            def run():
+                for job_list in job_lists:
+                    mckp_policy(job_list, 96, ion_nb, band_getter)
+            name = "mckp_policy/"+str(job_nb)+"/"+str(ion_nb)
+            results[name] = make_result({"njobs" : job_nb, "ion_nb" : ion_nb, "calls" : len(job_lists)}, time_it(run))
+
+def bench_bandwidth_get(apps, band_getter, results):
+    keys = []
+    for app in apps:
+        for ion in [1, 2, 4, 8]:
+            keys.append((app.app, app.nodes, app.procs, ion))
+    def run():
+        for i in range(100):
+            for key in keys:
+                band_getter.get(*key)
+    results["bandwidth_get"] = make_result({"calls" : 100*len(keys)}, time_it(run))
+
+def bench_register_policy_call(apps, band_getter, results):
+    seed(benchmark_seed)
+    decisions = []
+    for i in range(200):
+        decision = {}
+        for job in make_jobs(apps, randint(1, 6)):
+            decision[job] = [1, 2, 4, 8][randint(0, 3)]
+        decisions.append(decision)
+    def run():
+        metrics = Metrics(band_getter)
+        for clock, decision in enumerate(decisions):
+            metrics.register_policy_call(len(decision), float(clock), decision)
+    results["register_policy_call"] = make_result({"calls" : len(decisions)}, time_it(run))
+
+def bench_simulation(apps, band_getter, results):
+    for node_nb, ion_nb, minimum_time in settings:
+        seed(benchmark_seed)
+        queues = [make_a_queue(apps, node_nb, minimum_time) for i in range(simulated_queue_nb)]
+        for policy in ["baseline", "mckp"]:
+            def run():
+                for queue in queues:
+                    simulate_execution_with_policy(queue, node_nb, ion_nb, policy, band_getter)
+            name = "simulate_execution_with_policy/"+policy+"/"+str(node_nb)+"/"+str(ion_nb)+"/"+str(minimum_time)
+            results[name] = make_result({"policy" : policy, "node_nb" : node_nb, "ion_nb" : ion_nb, "minimum_time" : minimum_time, "queues" : len(queues)}, time_it(run))
+
+#simulate_batch (batch_simulation.py), with the same queues as the
+#serial simulations it replaces, which are timed as well
+def bench_batch_simulation(apps, band_getter, results):
+    for node_nb, ion_nb, minimum_time in settings:
+        seed(benchmark_seed)
+        queues = [make_a_queue(apps, node_nb, minimum_time) for i in range(batch_queue_nb)]
+        for policy in ["baseline", "mckp"]:
+            params = {"policy" : policy, "node_nb" : node_nb, "ion_nb" : ion_nb, "minimum_time" : minimum_time, "queues" : len(queues)}
+            def run_serially():
+                for queue in queues:
+                    simulate_execution_with_policy(queue, node_nb, ion_nb, policy, band_getter)
+            def run_batch():
+                simulate_batch(queues, node_nb, ion_nb, policy, band_getter)
+            suffix = "/"+policy+"/"+str(node_nb)+"/"+str(ion_nb)+"/"+str(minimum_time)
+            results["simulate_serially"+suffix] = make_result(params, time_it(run_serially))
+            results["simulate_batch"+suffix] = make_result(params, time_it(run_batch))
+
+#the generation of queues of generate_queues.py (with its default 
+#filters and deduplication), without writing the output
+def bench_generation(apps, band_getter, results):
+    for node_nb, ion_nb, minimum_time in settings:
+        config = make_config(node_nb=node_nb, ion_nb=ion_nb, minimum_time=minimum_time, queue_nb=generated_queue_nb, random_seed=benchmark_seed, worker_nb=1)
+        def run():
+            for new_queue in generate(config, apps, band_getter):
+                new_queue.get_output_line(new_queue.encode())
+        name = "generate_queues/"+str(node_nb)+"/"+str(ion_nb)+"/"+str(minimum_time)
+        results[name] = make_result({"node_nb" : node_nb, "ion_nb" : ion_nb, "minimum_time" : minimum_time, "queues" : generated_queue_nb}, time_it(run))
+
+#compares the results to the ones in baseline (as written by this
+#script), prints a line per benchmark and returns the names of the
+#benchmarks that got slower by more than tolerance
+def compare(results, baseline):
+    regressions = []
+    for name in results:
+        if not (name in baseline["benchmarks"]):
+            print(name+": not in the baseline")
+            continue
+        ratio = results[name]["min"]/baseline["benchmarks"][name]["min"]
+        status = ""
+        if ratio > 1.0 + tolerance:
+            status = "  REGRESSION"
+            regressions.append(name)
+        print(name+": "+("%.3f" % ratio)+"x the baseline time"+status)
+    return regressions
+
+#######################################################################
+#the messages printed by the code being measured are discarded
+with contextlib.redirect_stdout(io.StringIO()):
+    apps = read_runtime(input_file)
+    band_getter = Bandwidth()
+    results = {}
+    bench_calculate_makespan(apps, results)
+    bench_mckp_policy(apps, band_getter, results)
+    bench_bandwidth_get(apps, band_getter, results)
+    bench_register_policy_call(apps, band_getter, results)
+    bench_simulation(apps, band_getter, results)
+    bench_batch_simulation(apps, band_getter, results)
+    bench_generation(apps, band_getter, results)
+report = {"metadata" : {"python" : platform.python_version(),
+        "numpy" : numpy.__version__,
+        "machine" : platform.machine(),
+        "timestamp" : time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeats" : repeats,
+        "seed" : benchmark_seed},
+    "benchmarks" : results}
+arq = open(output_file, "w")
+json.dump(report, arq, indent=1)
+arq.close()
+print("Wrote "+str(len(results))+" benchmarks to "+output_file)
+if baseline_file is not None:
+    arq = open(baseline_file, "r")
+    baseline = json.load(arq)
+    arq.close()
+    if len(compare(results, baseline)) > 0:
+        sys.exit(1)
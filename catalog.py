@@ -0,0 +1,160 @@
+import os
+from hashlib import sha256
+import numpy
+from application import Application
+from bandwidth import Bandwidth
+
+#changes whenever the contents of the cache files change, so old cache
+#files are not used
+CATALOG_VERSION = "1"
+
+#returns the columns of a file with one record per line and fields
+#separated by ";", whose first line is a header, as a dict relating the
+#name of each column in the header to a numpy array of str
+def read_columns(filename):
+	arq = open(filename, "r")
+	header = arq.readline().split("\n")[0].split(";")
+	fields = [line.split("\n")[0].split(";") for line in arq if line.strip() != ""]
+	arq.close()
+	assert all([len(parsed) == len(header) for parsed in fields])
+	data = numpy.array(fields, dtype=str).reshape(len(fields), len(header))
+	return {name : data[:, column] for column, name in enumerate(header)}
+
+#returns, for each element of keys (a numpy array), the number of its
+#group, where groups are numbered in the order they first appear in
+#keys, and the position of the first element of each group
+def group_in_order(keys):
+	unique, first, inverse = numpy.unique(keys, return_index=True, return_inverse=True)
+	order = numpy.argsort(first)
+	rank = numpy.empty(len(order), dtype=int)
+	rank[order] = numpy.arange(len(order))
+	return rank[inverse.reshape(-1)], first[order]
+
+#summarizes values by cell (both numpy arrays of the same length, cell
+#numbers go from 0 to cell_nb-1) with summary_method ("median" or
+#"mean"). Returns an array of cell_nb values, NaN for the empty cells.
+#The results are the same as calling numpy.median or numpy.mean on the
+#values of each cell.
+def summarize_cells(values, cells, cell_nb, summary_method):
+	assert (summary_method == "median") or (summary_method == "mean")
+	counts = numpy.bincount(cells, minlength=cell_nb)
+	starts = numpy.cumsum(counts) - counts
+	present = counts > 0
+	ret = numpy.full(cell_nb, numpy.nan)
+	if summary_method == "median":
+		ordered = values[numpy.lexsort((values, cells))]
+		low = ordered[starts[present] + (counts[present]-1)//2]
+		high = ordered[starts[present] + counts[present]//2]
+		ret[present] = (low + high)/2
+	else:
+		#keeps the order of the file inside each cell. The sum
+		#of each cell is done by numpy.mean itself (numpy.add.reduceat
+		#adds the values in a different order, so the results
+		#would differ in the last digits)
+		ordered = values[numpy.argsort(cells, kind="stable")]
+		for cell in numpy.flatnonzero(present):
+			ret[cell] = numpy.mean(ordered[starts[cell]:starts[cell]+counts[cell]])
+	return ret
+
+#parses the runtime database (see runtime.csv). Returns a dict of numpy
+#arrays: app_names, app_nodes and app_procs describe each application
+#(in the order they first appear in the file), and runtime_matrix has
+#their runtime (combined with summary_method) with each number of I/O
+#nodes in runtime_forwarders (NaN where there is no observation)
+def compile_runtime(filename, summary_method):
+	columns = read_columns(filename)
+	names = columns["application"]
+	nodes = columns["clients"].astype(int)
+	procs = columns["processes"].astype(int)
+	ion = columns["forwarders"].astype(int)
+	times = columns["runtime"].astype(float)
+	keys = numpy.char.add(numpy.char.add(numpy.char.add(names, ";"), columns["clients"]), numpy.char.add(";", columns["processes"]))
+	app_ids, first = group_in_order(keys)
+	forwarders, ion_columns = numpy.unique(ion, return_inverse=True)
+	ion_columns = ion_columns.reshape(-1)
+	cells = app_ids*len(forwarders) + ion_columns
+	runtime = summarize_cells(times, cells, len(first)*len(forwarders), summary_method)
+	return {"app_names" : names[first],
+		"app_nodes" : nodes[first],
+		"app_procs" : procs[first],
+		"runtime_forwarders" : forwarders,
+		"runtime_matrix" : runtime.reshape(len(first), len(forwarders))}
+
+#parses the bandwidth database (see bandwidth.csv) the same way as
+#Bandwidth.read_database. Returns a dict of numpy arrays: band_scenarios,
+#band_clients and band_processes describe each row of band_matrix, and
+#band_forwarders gives the number of I/O nodes of each column
+def compile_bandwidth(filename):
+	columns = read_columns(filename)
+	clients = columns["clients"].astype(int)
+	processes = columns["processes"].astype(int)
+	forwarders = columns["forwarders"].astype(int)
+	bandwidth = columns["bandwidth"].astype(float)
+	keys = numpy.char.add(numpy.char.add(numpy.char.add(columns["scenario"], ";"), columns["clients"]), numpy.char.add(";", columns["processes"]))
+	row_ids, first = group_in_order(keys)
+	band_forwarders, band_columns = numpy.unique(forwarders, return_inverse=True)
+	band_columns = band_columns.reshape(-1)
+	matrix = numpy.full((len(first), len(band_forwarders)), numpy.nan)
+	#when there are several entries for a row and a column, the
+	#first one is used
+	cells, first_entry = numpy.unique(row_ids*len(band_forwarders) + band_columns, return_index=True)
+	matrix.flat[cells] = bandwidth[first_entry]
+	return {"band_scenarios" : columns["scenario"][first],
+		"band_clients" : clients[first],
+		"band_processes" : processes[first],
+		"band_forwarders" : band_forwarders,
+		"band_matrix" : matrix}
+
+#returns the name of the cache file for these input files. It depends on
+#their contents, so it changes when they are modified
+def cache_name(cache_dir, runtime_file, bandwidth_file, summary_method):
+	digest = sha256((CATALOG_VERSION+";"+summary_method+";").encode())
+	for filename in [runtime_file, bandwidth_file]:
+		arq = open(filename, "rb")
+		digest.update(arq.read())
+		arq.close()
+		digest.update(b";")
+	return os.path.join(cache_dir, "catalog-"+digest.hexdigest()+".npz")
+
+#returns the list of Application objects and the Bandwidth object
+#described by the compiled catalog
+def make_catalog(catalog, debug=False):
+	apps = []
+	forwarders = catalog["runtime_forwarders"]
+	for app_id in range(len(catalog["app_names"])):
+		new_app = Application(str(catalog["app_names"][app_id]), int(catalog["app_nodes"][app_id]), int(catalog["app_procs"][app_id]), debug)
+		row = catalog["runtime_matrix"][app_id]
+		new_app.set_runtime({int(forwarders[column]) : row[column] for column in range(len(forwarders)) if not numpy.isnan(row[column])})
+		apps.append(new_app)
+	rows = {}
+	for row in range(len(catalog["band_scenarios"])):
+		rows[(str(catalog["band_scenarios"][row]), int(catalog["band_clients"][row]), int(catalog["band_processes"][row]))] = row
+	band_getter = Bandwidth((rows, [int(forwarders) for forwarders in catalog["band_forwarders"]], catalog["band_matrix"]))
+	return apps, band_getter
+
+#returns the list of Application objects (the same as read_runtime) and
+#the Bandwidth object for the runtime and bandwidth databases. The
+#compiled catalog is kept in a binary file in cache_dir, named after the
+#contents of both files (see cache_name), so later runs with the same
+#files only load it. With cache_dir = None, nothing is cached.
+def load_catalog(runtime_file="runtime.csv", bandwidth_file=Bandwidth.DB_BANDWIDTH_FILE, summary_method="median", cache_dir=".catalog_cache", debug=False):
+	catalog = None
+	if cache_dir is not None:
+		filename = cache_name(cache_dir, runtime_file, bandwidth_file, summary_method)
+		if os.path.isfile(filename):
+			if debug:
+				print("loading the catalog from "+filename)
+			loaded = numpy.load(filename)
+			catalog = {name : loaded[name] for name in loaded.files}
+			loaded.close()
+	if catalog is None:
+		catalog = compile_runtime(runtime_file, summary_method)
+		catalog.update(compile_bandwidth(bandwidth_file))
+		if cache_dir is not None:
+			os.makedirs(cache_dir, exist_ok=True)
+			#written to a temporary file and then renamed, so
+			#other processes never see an incomplete file
+			temporary = filename+"."+str(os.getpid())+".tmp.npz"
+			numpy.savez(temporary, **catalog)
+			os.replace(temporary, filename)
+	return make_catalog(catalog, debug)
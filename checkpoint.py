@@ -0,0 +1,87 @@
+import json
+import os
+import numpy
+from columnar_output_file import HEADER_SIZE, read_dtype
+
+#changes whenever the contents of the checkpoint files change, so old
+#checkpoints are not used
+CHECKPOINT_VERSION = 1
+
+#writes a checkpoint of a run to filename: the output file and its
+#format, offset (how many bytes of the output file are complete, the
+#rest is discarded when resuming), accepted_nb (how many queues are in
+#these bytes), and position (where the generation continues, see
+#generate in generate_queues.py). The file is written to a temporary
+#file and then renamed, so it is always either the previous checkpoint
+#or the new one, even if the process is killed while writing it
+def write_checkpoint(filename, output_file, output_format, offset, accepted_nb, position):
+	saved = dict(position)
+	if "random_state" in saved:
+		version, internal, gauss = saved["random_state"]
+		saved["random_state"] = [version, list(internal), gauss]
+	checkpoint = {"version" : CHECKPOINT_VERSION,
+		"output_file" : output_file,
+		"output_format" : output_format,
+		"offset" : offset,
+		"accepted_nb" : accepted_nb,
+		"position" : saved}
+	temporary = filename+"."+str(os.getpid())+".tmp"
+	arq = open(temporary, "w")
+	json.dump(checkpoint, arq)
+	arq.flush()
+	os.fsync(arq.fileno())
+	arq.close()
+	os.replace(temporary, filename)
+
+#returns the checkpoint written to filename by write_checkpoint (a
+#dict), or None if there is no such file or it was written by another
+#version
+def read_checkpoint(filename):
+	if not os.path.isfile(filename):
+		return None
+	arq = open(filename, "r")
+	checkpoint = json.load(arq)
+	arq.close()
+	if checkpoint.get("version") != CHECKPOINT_VERSION:
+		return None
+	position = checkpoint["position"]
+	if "random_state" in position:
+		version, internal, gauss = position["random_state"]
+		position["random_state"] = (version, tuple(internal), gauss)
+	return checkpoint
+
+#returns the encodings of the queues written to a csv output file (see
+#OutputFile) and truncates the file after the last one. With an
+#offset, the file is first truncated to it, otherwise an incomplete
+#last line is discarded
+def read_accepted_csv(filename, offset=None):
+	arq = open(filename, "r+b")
+	if offset is not None:
+		arq.truncate(offset)
+	arq.seek(0)
+	lines = arq.read().split(b"\n")
+	#what comes after the last "\n" is incomplete (or empty)
+	complete = lines[:-1]
+	arq.truncate(sum([len(line)+1 for line in complete]))
+	arq.close()
+	#the first line is the header
+	return [line.split(b";")[0].decode() for line in complete[1:]]
+
+#returns the encodings of the queues written to a npy output file (see
+#ColumnarOutputFile), and truncates the file after the last one. The 
+#type of the records (with the width of the queue column, which may
+#have grown after the checkpoint) comes from the header, but the number
+#of records does not (the header only has it after the file is closed).
+#With count (the number of queues of a checkpoint), the records after 
+#them are discarded, otherwise the number of records is obtained from 
+#the size of the file and an incomplete last record is discarded
+def read_accepted_npy(filename, count=None):
+	dtype = read_dtype(filename)
+	complete = max(0, (os.path.getsize(filename) - HEADER_SIZE)//dtype.itemsize)
+	if (count is None) or (count > complete):
+		count = complete
+	records = numpy.fromfile(filename, dtype=dtype, count=count, offset=HEADER_SIZE)
+	arq = open(filename, "r+b")
+	arq.truncate(HEADER_SIZE + count*dtype.itemsize)
+	arq.close()
+	return [code.decode() for code in records["queue"]]
@@ -0,0 +1,209 @@
+import os
+import struct
+import numpy
+from numpy.lib import format
+from numpy.lib.format import MAGIC_PREFIX, dtype_to_descr
+
+#the columns of the output, in the same order as the header of the csv
+#output (see make_header in generate_queues.py) and as the values
+#returned by Queue.get_output_values. The queue column is added by
+#ColumnarOutputFile with the chosen width
+COLUMNS = [("njobs", numpy.int32),
+	("min_makespan", numpy.float64),
+	("max_makespan", numpy.float64),
+	("baseline_makespan", numpy.float64),
+	("mckp_makespan", numpy.float64),
+	("baseline_mean_bandwidth", numpy.float64),
+	("mckp_mean_bandwidth", numpy.float64),
+	("baseline_median_bandwidth", numpy.float64),
+	("mckp_median_bandwidth", numpy.float64),
+	("baseline_max_bandwidth", numpy.float64),
+	("mckp_max_bandwidth", numpy.float64),
+	("mckp_calls", numpy.int32),
+	("mckp_changes", numpy.int32),
+	("mckp_median_period", numpy.float64),
+	("mckp_mean_period", numpy.float64),
+	("mckp_median_njobs", numpy.float64),
+	("mckp_mean_njobs", numpy.float64)]
+
+#length reserved for the header of the file, so it can be rewritten
+#with the final number of queues when the file is closed
+HEADER_SIZE = 4096
+
+#returns the type of the records of a file with code_width (the maximum
+#length of the encoded queues)
+def make_dtype(code_width):
+	return numpy.dtype([("queue", "S"+str(code_width))] + COLUMNS)
+
+#returns the type of the records of a file written by
+#ColumnarOutputFile, from its header
+def read_dtype(filename):
+	arq = open(filename, "rb")
+	format.read_magic(arq)
+	shape, fortran_order, dtype = format.read_array_header_1_0(arq)
+	arq.close()
+	return dtype
+
+class ColumnarOutputFile:
+	"""
+	An alternative to OutputFile that writes the generated queues
+	and their metrics as a binary .npy file of records (a numpy
+	structured array), instead of a csv. The queue is stored as a
+	fixed-width string, the other columns as int32 or float64 (see
+	COLUMNS). The file can be loaded with load_queues without any
+	parsing (it is memory-mapped).
+
+	Records are kept in a buffer and written in chunks. The header
+	(which includes the number of records) is rewritten when the
+	file is closed, so the file is only valid after close is called.
+
+	The length of the encoded queues is not known in advance, so
+	when a queue is longer than code_width, the queue column is
+	made wider (at least twice as wide) and the records already in
+	the file are rewritten with the new width (see grow).
+
+	Attributes
+	----------
+	arq : file descriptor
+		the file that is opened at the constructor and used to
+		output data.
+	dtype : numpy.dtype
+		the type of each record
+	code_width : int
+		maximum length of the encoded queues (the width of
+		the queue column)
+	buffer : numpy.ndarray
+		the records that were not written yet
+	buffered : int
+		how many records are in the buffer
+	count : int
+		how many records are in the file (or were given to 
+		write) so far
+	"""
+	def __init__(self, filename, code_width=64, chunk=4096, append=False):
+		"""
+		Parameters
+		----------
+		filename : str
+			the name of the file to the created (usually
+			ending in .npy). If it exists, it will be
+			overwritten (unless append is True).
+		code_width : int
+			the initial width of the queue column (it grows
+			if longer queues are written)
+		chunk : int
+			how many records are kept in the buffer before
+			writing them to the file
+		append : boolean
+			if True, the records of an existing file are
+			kept (with the width of its queue column) and
+			new ones are written after them. The file must 
+			end with a complete record (see 
+			read_accepted_npy in checkpoint.py)
+		"""
+		if append:
+			code_width = read_dtype(filename)["queue"].itemsize
+		self.code_width = code_width
+		self.dtype = make_dtype(code_width)
+		self.buffer = numpy.zeros(chunk, dtype=self.dtype)
+		self.buffered = 0
+		if append:
+			self.count = (os.path.getsize(filename) - HEADER_SIZE)//self.dtype.itemsize
+			self.arq = open(filename, "r+b")
+		else:
+			self.count = 0
+			self.arq = open(filename, "w+b")
+		self.write_header()
+		self.arq.seek(HEADER_SIZE + self.count*self.dtype.itemsize)
+
+	def write_header(self):
+		"""
+		Writes the header of a .npy file (version 1.0) with
+		the current number of records, padded to HEADER_SIZE.
+		"""
+		header = "{'descr': "+repr(dtype_to_descr(self.dtype))+", 'fortran_order': False, 'shape': ("+str(self.count)+",), }"
+		#magic string, version, and the length of the header
+		prefix_size = len(MAGIC_PREFIX) + 2 + 2
+		assert len(header) + 1 <= HEADER_SIZE - prefix_size
+		header = header.ljust(HEADER_SIZE - prefix_size - 1) + "\n"
+		self.arq.seek(0)
+		self.arq.write(MAGIC_PREFIX + bytes([1, 0]) + struct.pack("<H", len(header)) + header.encode("latin1"))
+
+	def write(self, values):
+		"""
+		Parameters
+		----------
+		values : tuple
+			the values returned by Queue.get_output_values
+		"""
+		if len(values[0]) > self.code_width:
+			self.grow(max(len(values[0]), 2*self.code_width))
+		self.buffer[self.buffered] = values
+		self.buffered += 1
+		self.count += 1
+		if self.buffered == len(self.buffer):
+			self.flush()
+
+	def write_queue(self, queue):
+		"""
+		Writes the record of a Queue (see 
+		Queue.get_output_values). It can be used as a sink (see
+		pipeline.py).
+		"""
+		self.write(queue.get_output_values(queue.encode()))
+
+	def flush(self):
+		self.arq.write(self.buffer[:self.buffered].tobytes())
+		self.buffered = 0
+
+	def grow(self, code_width):
+		"""
+		Makes the queue column code_width wide. The records in
+		the file are rewritten in place with the new width, one
+		chunk at a time from the last one (each chunk moves 
+		forward, to where only records that were already moved
+		were), and the header is updated.
+		"""
+		self.flush()
+		old_dtype = self.dtype
+		self.code_width = code_width
+		self.dtype = make_dtype(code_width)
+		chunk = len(self.buffer)
+		self.buffer = numpy.zeros(chunk, dtype=self.dtype)
+		end = self.count
+		while end > 0:
+			start = max(0, end - chunk)
+			self.arq.seek(HEADER_SIZE + start*old_dtype.itemsize)
+			old = numpy.frombuffer(self.arq.read((end - start)*old_dtype.itemsize), dtype=old_dtype)
+			new = numpy.zeros(end - start, dtype=self.dtype)
+			for name in old_dtype.names:
+				new[name] = old[name]
+			self.arq.seek(HEADER_SIZE + start*self.dtype.itemsize)
+			self.arq.write(new.tobytes())
+			end = start
+		self.write_header()
+		self.arq.seek(HEADER_SIZE + self.count*self.dtype.itemsize)
+
+	def sync(self):
+		"""
+		Writes the buffer and the header with the current
+		number of records, so the file is valid, and makes sure
+		it reached the disk. Returns the size of the file.
+		"""
+		self.flush()
+		self.write_header()
+		self.arq.seek(HEADER_SIZE + self.count*self.dtype.itemsize)
+		self.arq.flush()
+		os.fsync(self.arq.fileno())
+		return self.arq.tell()
+
+	def close(self):
+		self.flush()
+		self.write_header()
+		self.arq.close()
+
+#returns the queues written by ColumnarOutputFile to filename, as a
+#read-only memory-mapped numpy structured array (one column per metric,
+#see COLUMNS)
+def load_queues(filename):
+	return numpy.load(filename, mmap_mode="r")
@@ -0,0 +1,165 @@
+from application_encode import encode_application
+from job import Job
+from policy import MCKP_POLICIES,greedy_mckp_solution
+
+class DecisionTable:
+	"""
+	Precomputed decisions of the MCKP policy for every set of
+	applications that may run together on the cluster.
+
+	Only applications that fit together in node_nb processing nodes
+	can be running at the same time, so only a finite number of
+	multisets of applications will ever be given to the policy. We
+	solve the MCKP once for each of them and keep the decisions, so
+	during the simulation applying the policy is just a lookup.
+
+	A multiset is identified by its canonical encoding: the letters
+	(see application_encode.py) of its applications in alphabetical
+	order. For instance, two jobs running BTIO with 32 nodes and one
+	running HACC are "AAC".
+
+	The decisions of mckp_policy do not depend on the order of the
+	jobs, except for which one of multiple jobs running the same
+	application receives each number of I/O nodes. That is given by
+	the position of the jobs in the list (the first job running an
+	application always gets the first number of I/O nodes decided
+	for that application, and so on), so we keep, for each
+	application, the list of decisions in that order.
+
+	...
+
+	Attributes
+	----------
+	node_nb : int
+		number of processing nodes
+	ion_nb : int
+		number of I/O nodes
+	policy : str
+		the solver of the MCKP, "mckp", "sparse_mckp" or 
+		"greedy_mckp" (see policy.py)
+	bandwidth_getter : Bandwidth
+		used to solve the multisets that are missing, with 
+		lazy=True (None otherwise)
+	decisions : dict {str, dict {str, List[(int, float)]}}
+		for each canonical encoding, relates the letter of each
+		application to the numbers of I/O nodes given to the
+		jobs running it, in the order they appear in the list
+		of jobs, together with the bandwidth each of these jobs
+		obtains with that decision
+	upper_bounds : dict {str, float}
+		with "greedy_mckp", the upper bound on the best 
+		bandwidth given by greedy_mckp_solution for each 
+		canonical encoding (empty otherwise)
+	misses : int
+		how many lookups found their multiset missing, so it 
+		was solved (with lazy=True)
+
+	Methods
+	-------
+	lookup(job_list)
+		returns the decisions for a list of jobs, the global
+		bandwidth they give and the upper bound of the policy
+	"""
+	def __init__(self, apps, node_nb, ion_nb, bandwidth_getter, debug=False, policy="mckp", lazy=False):
+		"""
+		Enumerates all multisets of applications that fit in
+		node_nb processing nodes and solves the MCKP for each
+		of them (unless lazy is True).
+
+		Parameters
+		----------
+		apps : List[Application]
+			all applications that may be in the queues
+		bandwidth_getter : Bandwidth
+			used by the MCKP policy
+		policy : str
+			which solver of the MCKP is used
+		lazy : boolean
+			if True, each multiset is solved the first time
+			it is looked up
+		"""
+		self.node_nb = node_nb
+		self.policy = policy
+		self.ion_nb = ion_nb
+		self.decisions = {}
+		self.upper_bounds = {}
+		self.misses = 0
+		if lazy:
+			self.bandwidth_getter = bandwidth_getter
+			return
+		self.bandwidth_getter = None
+		letters = {}
+		for app in apps:
+			if app.nodes <= node_nb:
+				letters[encode_application(app)] = app
+		ordered = sorted(letters.keys())
+		#depth-first enumeration of the multisets, choosing
+		#how many jobs of each application (in alphabetical
+		#order) are in the set. Each job needs at least one I/O
+		#node, so sets with more than ion_nb jobs are skipped
+		pending = [(0, node_nb, [])]
+		while len(pending) > 0:
+			index, available_nodes, chosen = pending.pop()
+			if index == len(ordered):
+				if len(chosen) > 0:
+					self.solve([letters[letter] for letter in chosen], bandwidth_getter)
+				continue
+			app = letters[ordered[index]]
+			count = 0
+			while (count*app.nodes <= available_nodes) and (len(chosen) + count <= ion_nb):
+				pending.append((index+1, available_nodes - count*app.nodes, chosen + [ordered[index]]*count))
+				count += 1
+		if debug:
+			print("precomputed the MCKP decisions for "+str(len(self.decisions))+" sets of applications")
+
+	def solve(self, multiset, bandwidth_getter):
+		"""
+		Solves the MCKP for a list of Application objects given
+		in the canonical order, and stores the decisions.
+		"""
+		job_list = [Job(jobid, 0, app) for jobid,app in enumerate(multiset)]
+		if self.policy == "greedy_mckp":
+			#the bound is kept so the optimality gap can be
+			#measured (see Metrics)
+			decision, upper_bound = greedy_mckp_solution(job_list, self.ion_nb, bandwidth_getter)
+		else:
+			decision = MCKP_POLICIES[self.policy](job_list, self.node_nb, self.ion_nb, bandwidth_getter)
+		key = ""
+		by_letter = {}
+		for job in job_list:
+			letter = encode_application(job.app)
+			key += letter
+			if not (letter in by_letter):
+				by_letter[letter] = []
+			band = bandwidth_getter.get(job.app.app, job.app.nodes, job.app.procs, decision[job])
+			by_letter[letter].append((decision[job], band))
+		self.decisions[key] = by_letter
+		if self.policy == "greedy_mckp":
+			self.upper_bounds[key] = upper_bound
+
+	def lookup(self, job_list):
+		"""
+		Returns a tuple (decision, global_band, upper_bound),
+		where decision is a dict {Job, int} as returned by 
+		mckp_policy for job_list, global_band is the bandwidth
+		obtained with it, and upper_bound the bound given by
+		greedy_mckp_solution (None with the other policies).
+		The bandwidth is summed in the order of job_list, as
+		Metrics.register_policy_call does.
+		"""
+		letters = [encode_application(job.app) for job in job_list]
+		key = "".join(sorted(letters))
+		if (not (key in self.decisions)) and (self.bandwidth_getter is not None):
+			self.misses += 1
+			self.solve([job.app for letter,job in sorted(zip(letters, job_list), key=lambda pair: pair[0])], self.bandwidth_getter)
+		by_letter = self.decisions[key]
+		used = {}
+		decision = {}
+		global_band = 0.0
+		for job,letter in zip(job_list, letters):
+			position = used.get(letter, 0)
+			ion, band = by_letter[letter][position]
+			decision[job] = ion
+			global_band += band
+			used[letter] = position + 1
+		return decision, global_band, self.upper_bounds.get(key)
@@ -0,0 +1,89 @@
+from hashlib import blake2b
+from math import ceil, log
+
+class Deduplicator:
+	"""
+	Keeps the encodings of queues that were already accepted (see
+	Queue.encode), so we can detect duplicates in constant time.
+
+	There are three modes:
+	- "set" keeps the encodings themselves in a set (exact)
+	- "fingerprint" keeps only a 64-bit hash of each encoding. It
+	  uses much less memory for long queues; two different queues
+	  are taken as duplicates with probability around
+	  n^2/2^65 for n queues
+	- "bloom" keeps a Bloom filter sized for expected_nb queues
+	  with a rate of false positives of false_positive_rate (a
+	  queue that was never seen is taken as a duplicate with that
+	  probability). It uses a fixed amount of memory (about 10 bits
+	  per queue for 1%), so it is meant for tens of millions of
+	  queues
+	There are no false negatives: a queue that was added is always
+	detected as a duplicate.
+
+	Attributes
+	----------
+	mode : str
+		"set", "fingerprint", or "bloom"
+	seen : set
+		the encodings (or their hashes) in the "set" and
+		"fingerprint" modes
+	bits : bytearray
+		the Bloom filter in the "bloom" mode
+	bit_nb : int
+		number of bits of the Bloom filter
+	hash_nb : int
+		number of hash functions of the Bloom filter
+	count : int
+		how many encodings were added
+
+	Methods
+	-------
+	contains(encoded)
+		returns True if encoded was (probably, depending on the
+		mode) added before
+	add(encoded)
+		registers encoded
+	"""
+	def __init__(self, mode="set", expected_nb=1000, false_positive_rate=0.01):
+		assert mode in ["set", "fingerprint", "bloom"]
+		self.mode = mode
+		self.count = 0
+		self.seen = set()
+		if mode == "bloom":
+			self.bit_nb = max(8, int(ceil(-expected_nb*log(false_positive_rate)/(log(2)**2))))
+			self.hash_nb = max(1, int(round(self.bit_nb*log(2)/expected_nb)))
+			self.bits = bytearray((self.bit_nb+7)//8)
+
+	def fingerprint(self, encoded):
+		return int.from_bytes(blake2b(encoded.encode(), digest_size=8).digest(), "little")
+
+	def bloom_positions(self, encoded):
+		"""
+		returns the hash_nb positions of the Bloom filter for
+		encoded (obtained from two hashes by double hashing)
+		"""
+		digest = blake2b(encoded.encode(), digest_size=16).digest()
+		first = int.from_bytes(digest[:8], "little")
+		second = int.from_bytes(digest[8:], "little") | 1
+		return [(first + i*second) % self.bit_nb for i in range(self.hash_nb)]
+
+	def contains(self, encoded):
+		if self.mode == "set":
+			return encoded in self.seen
+		elif self.mode == "fingerprint":
+			return self.fingerprint(encoded) in self.seen
+		for position in self.bloom_positions(encoded):
+			if not (self.bits[position >> 3] & (1 << (position & 7))):
+				return False
+		return True
+
+	def add(self, encoded):
+		self.count += 1
+		if self.mode == "set":
+			self.seen.add(encoded)
+		elif self.mode == "fingerprint":
+			self.seen.add(self.fingerprint(encoded))
+		else:
+			for position in self.bloom_positions(encoded):
+				self.bits[position >> 3] |= 1 << (position & 7)
@@ -0,0 +1,91 @@
+import operator
+from job_queue import Queue
+
+#the stage of Queue (see Queue.STAGES) that gives each attribute that
+#can be used by a Filter
+STAGE_OF = {}
+for stage in Queue.STAGES:
+	for attribute in Queue.STAGES[stage]:
+		STAGE_OF[attribute] = stage
+
+COMPARISONS = {"<" : operator.lt,
+	"<=" : operator.le,
+	">" : operator.gt,
+	">=" : operator.ge,
+	"==" : operator.eq,
+	"!=" : operator.ne}
+
+class Filter:
+	"""
+	A condition generated queues must satisfy to be kept, in the
+	form "attribute comparison value". For instance,
+	Filter("mckp_metrics.median_njobs", ">=", 2) keeps only queues
+	where the median number of jobs given to the mckp policy is at
+	least 2.
+
+	Each filter needs a stage of the Queue (see Queue.STAGES),
+	obtained from the attribute, so we know how expensive it is to
+	check it.
+
+	...
+
+	Attributes
+	----------
+	attribute : str
+		the attribute of the Queue to be compared, with "." to
+		access attributes of attributes (as in
+		"baseline_metrics.makespan"). "njobs" is the length of
+		the queue.
+	comparison : str
+		one of the keys of COMPARISONS
+	value :
+		what the attribute is compared to
+	stage : str
+		the stage of the Queue needed to check this filter
+	"""
+	def __init__(self, attribute, comparison, value):
+		assert comparison in COMPARISONS
+		self.attribute = attribute
+		self.comparison = comparison
+		self.value = value
+		if attribute == "njobs":
+			self.stage = "encoding"
+		else:
+			self.stage = STAGE_OF[attribute.split(".")[0]]
+
+	def accepts(self, queue):
+		"""
+		Returns True if the Queue queue satisfies this filter
+		(computing the stage it needs if necessary).
+		"""
+		queue.compute(self.stage)
+		if self.attribute == "njobs":
+			current = len(queue.jobs)
+		else:
+			current = queue
+			for name in self.attribute.split("."):
+				current = getattr(current, name)
+		return COMPARISONS[self.comparison](current, self.value)
+
+	def __str__(self):
+		return self.attribute+" "+self.comparison+" "+str(self.value)
+
+#returns the filters ordered from the cheapest to the most expensive
+#stage (the order among filters of the same stage is kept)
+def order_filters(filters):
+	stages = list(Queue.STAGES)
+	return sorted(filters, key=lambda queue_filter: stages.index(queue_filter.stage))
+
+#returns True if the Queue queue passes all filters. They are checked
+#from the cheapest to the most expensive stage, and we stop at the
+#first one that fails, so the expensive stages are only computed for
+#queues that passed all the cheaper filters. If an Instrumentation is
+#given, rejections are counted in it (see instrumentation.py).
+def passes_filters(queue, filters, instrumentation=None):
+	for queue_filter in order_filters(filters):
+		if not queue_filter.accepts(queue):
+			if instrumentation is not None:
+				instrumentation.count("filtered")
+				instrumentation.count("filtered: "+str(queue_filter))
+			return False
+	return True
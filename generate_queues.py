@@ -1,12 +1,26 @@
-from random import seed,random
-from application import Application
-from queue import Queue
-from output_file import OutputFile
-from bandwidth import Bandwidth
+import argparse
+import re
+from random import SystemRandom
+#the other modules of the generator are only imported when they are
+#needed (see load_inputs and generate), so the command line (--help,
+#for instance) answers right away
 
 ####### PARAMETERS #####
 input_file = "runtime.csv"  #with the path so we can find it
+catalog_cache = ".catalog_cache" #directory where the applications and 
+            #the bandwidth database are kept in binary form after
+            #being parsed once, so later runs with the same input
+            #files start faster (see catalog.py). With None, the
+            #input files are parsed every time
 output_file = "random_queues.csv"   
+output_format = "csv"  #"csv" for a text file with one queue per line, or
+            #"npy" for a binary file with one column per metric
+            #that can be memory-mapped (see 
+            #columnar_output_file.py, output_file should then
+            #end in .npy)
+code_width = 64 #with output_format = "npy", the initial width of the
+            #column of the encoded queues (it is made wider, 
+            #rewriting the file, when a longer queue is written)
 debug = False 
 node_nb = 96  #how many processing nodes
 ion_nb = 12    #how many I/O nodes
@@ -16,41 +30,151 @@ summary_method = "median"  #how should we combine multiple executions
             #configuration to obtain an estimate for its 
             #execution time ("mean" or "median")
 queue_nb = 1000 #number of random queues to be generated and evaluated
+precompute_decisions = False #if True, the decisions of the mckp policy
+            #are computed once for every set of applications
+            #that may run together, and then looked up during
+            #the simulations (see decision_table.py)
+lazy_simulation = False #if True, the simulations keep a heap of the 
+            #projected end times of the jobs instead of looking
+            #for the next ones to end among all running jobs, 
+            #and only the jobs whose number of I/O nodes changed
+            #are updated at each event (see 
+            #simulate_execution_lazily in policy_simulation.py).
+            #It pays off with many jobs running at the same time
+            #(large node_nb). The results are the same up to 
+            #rounding, so they are not identical to the default
+exact_durations = False #if True, the bandwidth statistics are weighted 
+            #by the exact duration of each period. Otherwise,
+            #by the number of whole seconds it covers (as if
+            #we had the bandwidth every second)
+summary_metrics = False #if True, the metrics of the simulations keep
+            #running summaries instead of a list with every 
+            #event, so each queue takes little memory. The
+            #medians are exact for up to 200 distinct values and
+            #approximated above that, with a bound on their 
+            #error (see Metrics and quantile_sketch.py)
+dedup_mode = "set" #how to remember the generated queues to discard 
+            #duplicates: "set" (exact), "fingerprint" (a 
+            #64-bit hash per queue), or "bloom" (a Bloom 
+            #filter, for tens of millions of queues, see 
+            #deduplicator.py)
+mckp_policy = "mckp" #how the mckp policy is solved: "mckp" is the
+            #original dynamic program, where each application
+            #may get 1, 2, 4 or 8 I/O nodes, "sparse_mckp" takes
+            #the options of each application from the catalog and
+            #scales to hundreds of I/O nodes and dozens of jobs
+            #(see sparse_mckp_policy in policy.py), and 
+            #"greedy_mckp" is a fast approximation that reports
+            #its optimality gap (see greedy_mckp_policy and the
+            #mean_gap and max_gap metrics)
+queue_sampler = "rejection" #how the jobs of a queue are drawn: 
+            #"rejection" draws applications until the minimum
+            #time is reached and starts over if some application
+            #is missing, "covering" draws them in the same way 
+            #and then adds one job of each missing application
+            #at the end, so it never starts over (see 
+            #make_a_covering_queue in
+            #job_queue.py, the queues do not follow the same 
+            #distribution). With "covering", the expected number
+            #of attempts of the rejection sampler is printed
+simulation_memo = 0 #if larger than 0, the maximum number of snapshots
+            #of simulations kept so queues that start with the 
+            #same applications as a previous one are simulated
+            #from the end of that prefix (see simulation_memo.py).
+            #The results are the same. It only pays off with few
+            #distinct applications, so it is disabled by default
+batch_simulation = 0 #if larger than 0, the queues are simulated in
+            #batches of this many (as numpy arrays, see 
+            #batch_simulation.py) instead of one by one, which is
+            #faster. With worker_nb > 1, each worker simulates the
+            #queues of each of its tasks together. The results 
+            #are the same, unless a queue is generated twice in
+            #the same batch (see batch_filter_stage in 
+            #pipeline.py). With lazy_simulation, simulation_memo,
+            #summary_metrics or greedy_mckp, the queues are 
+            #simulated one by one
+worker_nb = 1 #number of processes generating and simulating queues. 
+            #With 1, everything is done in this process
+pipeline_buffer = 0 #if larger than 0, the queues are generated by 
+            #another thread of this process and up to this many
+            #of them wait to be written, so writing the output
+            #overlaps with generating the next queues (see
+            #buffered in pipeline.py). It mostly helps with 
+            #worker_nb > 1. The output is the same
+random_seed = None #seed for the random number generator, so runs can be
+            #reproduced (for the same seed, the output is the 
+            #same with the same worker_nb). With None, the 
+            #seed comes from the system
+queue_filters = [("mckp_metrics.median_njobs", ">=", 2)] #the generated
+            #queues must pass all these filters, given as 
+            #(attribute, comparison, value), to be kept (see 
+            #filters.py). They are checked from the cheapest to
+            #the most expensive, so queues are only simulated if
+            #they pass the filters that do not need the 
+            #simulation
+instrument = False #if True, the generation is instrumented: a 
+            #progress line is printed periodically and counters
+            #and timers of each step (attempts, retries, 
+            #duplicates, filtered queues, simulations) are written
+            #to report_file at the end (see instrumentation.py)
+progress_interval = 10 #with instrument = True, seconds between 
+            #progress lines
+report_file = "instrumentation.json" #with instrument = True, where 
+            #the final report is written
+checkpoint_file = None #if given, the progress of the run (how much of
+            #the output file is complete, and the state of the 
+            #random number generator) is saved to this file 
+            #every checkpoint_interval seconds and at the end, so
+            #an interrupted run can be resumed (see checkpoint.py)
+checkpoint_interval = 60 #seconds between two checkpoints
+resume = False #if True, the queues already in output_file are kept 
+            #(and will not be generated again), and new ones are
+            #added to it until there are queue_nb queues. With the
+            #checkpoint_file of the interrupted run, it continues 
+            #exactly where the last checkpoint was made (with the
+            #same worker_nb, the output is the same as if it had
+            #never been interrupted)
 ########################
 
-#reads information from the file and returns a list of Application
-#objects containing the information
-def read_runtime(filename):
-    arq = open(filename, "r")
-    contents = arq.readlines()
-    arq.close()
-    existing = {} #used to make sure each application is created
-        #only once. relates (app, nodes, procs) to the 
-        #corresponding Application object
-    for line in contents:
-        if "forwarders" in line:
-            continue #skip the header
-        #obtain information from the line
-        parsed= line.split('\n')[0].split(';')
-        print(parsed)
-        assert len(parsed) == 7
-        app = parsed[3]
-        nodes = int(parsed[1])
-        procs = int(parsed[2])
-        size = (nodes, procs)
-        ion = int(parsed[0])
-        time = float(parsed[5])
-        #store it
-        if not (app, nodes, procs) in existing:
-            new_app = Application(app, nodes, procs, debug)
-            existing[(app, nodes, procs)] = new_app
-        existing[(app, nodes, procs)].update_runtime(ion, time)
-    #call the estimate_runtime method of all Application objects to
-    #calculate the median execution time from all the observations
-    #registered with the update_runtime method just above
-    for app in existing:
-        existing[app].estimate_runtime(summary_method)
-    return list(existing.values())
+
+#the names of the parameters above. Their values are the default
+#configuration (see make_config)
+PARAMETER_NAMES = ["input_file", "catalog_cache", "output_file", 
+    "output_format", "code_width", "debug", "node_nb", "ion_nb", 
+    "minimum_time", "summary_method", "queue_nb", 
+    "precompute_decisions", "lazy_simulation", "exact_durations", 
+    "summary_metrics", "dedup_mode", "mckp_policy", "queue_sampler", "simulation_memo", "batch_simulation", "worker_nb", "pipeline_buffer", "random_seed", "queue_filters", 
+    "instrument", "progress_interval", "report_file", "checkpoint_file", 
+    "checkpoint_interval", "resume"]
+
+#returns a configuration for generate and run: a dict relating the name
+#of each parameter to its value. The values are the ones of the 
+#PARAMETERS section, except for the ones given as keyword arguments
+def make_config(**overrides):
+    config = {}
+    for name in PARAMETER_NAMES:
+        config[name] = globals()[name]
+    config["queue_filters"] = list(queue_filters)
+    for name in overrides:
+        assert name in config, "unknown parameter "+name
+        config[name] = overrides[name]
+    return config
+
+#returns the list of Application objects and the Bandwidth object for
+#config. They can be given to generate and run, and reused by several
+#configurations with the same input files
+def load_inputs(config):
+    from application import read_runtime
+    from bandwidth import Bandwidth
+    from catalog import load_catalog
+    #first obtain information about the applications and about
+    #bandwidth
+    if config["catalog_cache"] is None:
+        apps = read_runtime(config["input_file"], config["summary_method"], config["debug"])
+        band_getter = Bandwidth()
+    else:
+        apps, band_getter = load_catalog(config["input_file"], Bandwidth.DB_BANDWIDTH_FILE, config["summary_method"], config["catalog_cache"], config["debug"])
+    return apps, band_getter
 
 def make_header():
     header="queue;njobs;min_makespan;max_makespan;"
@@ -61,31 +185,232 @@ def make_header():
     header += "mckp_mean_period;mckp_median_njobs;mckp_mean_njobs"
     return header
 
-#######################################################################
-#first obtain information about the applications
-apps = read_runtime(input_file)
-print("Available applications: ")
-print([str(app) for app in apps])
-#obtain information about bandwidth
-band_getter = Bandwidth()
-#now generate random queues and write them to the output file
+#yields the random queues (Queue objects, with all metrics computed)
+#generated for config, until there are config["queue_nb"] of them.
+#They pass all filters and there are no duplicates. apps and
+#band_getter are the ones returned by load_inputs, they are loaded if
+#not given. decision_table is used if given (it must have been made for
+#the same node_nb and ion_nb), otherwise it is computed if
+#config["precompute_decisions"] is True. If an Instrumentation is 
+#given, the generation is recorded in it. accepted is a list of the 
+#encodings of queues that were already generated (by an interrupted 
+#run, for instance): they count towards queue_nb and are not generated
+#again. position is a dict with where the generation continues (see
+#generate_serially and generate_in_parallel, and "master_seed" for the
+#seed of the workers), it is updated as queues are generated
+def generate(config, apps=None, band_getter=None, decision_table=None, instrumentation=None, accepted=None, position=None):
+    from decision_table import DecisionTable
+    from deduplicator import Deduplicator
+    from filters import Filter
+    from generation import generate_serially,generate_in_parallel
+    from pipeline import filter_stage,batch_filter_stage,dedup_stage,simulation_stage
+    from simulation_memo import SimulationMemo
+    if apps is None:
+        apps, band_getter = load_inputs(config)
+    if (decision_table is None) and config["precompute_decisions"]:
+        decision_table = DecisionTable(apps, config["node_nb"], config["ion_nb"], band_getter, config["debug"], config["mckp_policy"])
+    filters = [Filter(*queue_filter) for queue_filter in config["queue_filters"]]
+    random_queues = Deduplicator(config["dedup_mode"], config["queue_nb"])
+    if accepted is not None:
+        for q in accepted:
+            random_queues.add(q)
+    if random_queues.count >= config["queue_nb"]:
+        return
+    random_seed = config["random_seed"]
+    memo = None
+    if config["worker_nb"] > 1:
+        if (position is not None) and ("master_seed" in position):
+            random_seed = position["master_seed"]
+        elif random_seed is None:
+            random_seed = SystemRandom().randrange(2**32)
+            print("Using random seed "+str(random_seed))
+        if position is not None:
+            position["master_seed"] = random_seed
+        candidates = generate_in_parallel(apps, config["node_nb"], config["ion_nb"], config["minimum_time"], config["debug"], band_getter, decision_table, config["lazy_simulation"], config["exact_durations"], filters, random_seed, config["worker_nb"], instrumentation=instrumentation, mckp_policy=config["mckp_policy"], sampler=config["queue_sampler"], position=position, memo_size=config["simulation_memo"], summary_only=config["summary_metrics"], batch_simulation=config["batch_simulation"] > 0)
+    else:
+        if config["simulation_memo"] > 0:
+            memo = SimulationMemo(config["simulation_memo"])
+        candidates = generate_serially(apps, config["node_nb"], config["ion_nb"], config["minimum_time"], config["debug"], band_getter, decision_table, config["lazy_simulation"], config["exact_durations"], random_seed, random_queues, instrumentation, config["mckp_policy"], config["queue_sampler"], position, memo, config["summary_metrics"])
+    try:
+        #discard queues that are not what we want (see 
+        #queue_filters) or that were already generated, and 
+        #compute the metrics of the others (see pipeline.py)
+        if (config["batch_simulation"] > 0) and (config["worker_nb"] == 1):
+            stages = batch_filter_stage(candidates, filters, config["batch_simulation"], instrumentation, position)
+        else:
+            stages = filter_stage(candidates, filters, instrumentation)
+        stages = dedup_stage(stages, random_queues, instrumentation)
+        stages = simulation_stage(stages)
+        for new_queue in stages:
+            if instrumentation is not None:
+                instrumentation.count("accepted")
+                instrumentation.progress(random_queues.count, config["queue_nb"])
+            yield new_queue
+            if random_queues.count >= config["queue_nb"]:
+                break
+    finally:
+        candidates.close()
+        if (memo is not None) and (instrumentation is not None):
+            memo.record(instrumentation)
+
+#returns what is needed to resume the run of config (see the resume
+#parameter): the encodings of the queues in the output file, and the
+#position where the generation continues (empty if there is no usable
+#checkpoint). The output file is truncated after the last complete 
+#queue, or to where the checkpoint was made
+def prepare_resume(config):
+    import os
+    from checkpoint import read_checkpoint,read_accepted_csv,read_accepted_npy
+    if not os.path.isfile(config["output_file"]):
+        return [], {}
+    checkpoint = None
+    if config["checkpoint_file"] is not None:
+        checkpoint = read_checkpoint(config["checkpoint_file"])
+        if (checkpoint is not None) and ((checkpoint["output_file"] != config["output_file"]) or (checkpoint["output_format"] != config["output_format"])):
+            print("The checkpoint "+config["checkpoint_file"]+" is not for "+config["output_file"]+", ignoring it")
+            checkpoint = None
+    if checkpoint is None:
+        offset = None
+        accepted_nb = None
+        position = {}
+    else:
+        offset = checkpoint["offset"]
+        accepted_nb = checkpoint["accepted_nb"]
+        position = checkpoint["position"]
+    if config["output_format"] == "csv":
+        accepted = read_accepted_csv(config["output_file"], offset)
+    else:
+        #the records may have been rewritten wider after the
+        #checkpoint, so the offset is not used
+        accepted = read_accepted_npy(config["output_file"], accepted_nb)
+    print("Resuming with "+str(len(accepted))+" queues from "+config["output_file"])
+    return accepted, position
+
+#generates the queues for config and writes them to the output file
 #(for an explanation of the columns of the output file, see the 
-#documentation of the Queue class)
-csv = OutputFile(output_file, make_header())
-seed()
-random_queues = []
-while len(random_queues) < queue_nb:
-    new_queue = Queue(apps, node_nb, ion_nb, minimum_time, debug, band_getter)
-    #here we can add filters to discard queues that are not what
-    #we want
-    if new_queue.mckp_metrics.median_njobs < 2:
-        continue
-    q = new_queue.encode()  #to understand how a queue of jobs is
-            #represented by a single string, see the
-            #application_encode.py file
-    if not (q in random_queues):
-        random_queues.append(q)
-        csv.write(new_queue.get_output_line(q))
-csv.close()
+#documentation of the Queue class). The other parameters are the same
+#as for generate. Returns the number of queues in the output file
+def run(config, apps=None, band_getter=None, decision_table=None):
+    import os
+    from time import perf_counter
+    from output_file import OutputFile
+    from columnar_output_file import ColumnarOutputFile
+    from instrumentation import Instrumentation
+    from checkpoint import write_checkpoint
+    from pipeline import buffered
+    if apps is None:
+        apps, band_getter = load_inputs(config)
+    print("Available applications: ")
+    print([str(app) for app in apps])
+    if config["queue_sampler"] == "covering":
+        from job_queue import expected_rejection_attempts
+        print("Expected attempts per queue with the rejection sampler: "+("%.2f" % expected_rejection_attempts(apps, config["node_nb"], config["minimum_time"])))
+    if config["resume"]:
+        accepted, position = prepare_resume(config)
+    else:
+        accepted, position = [], {}
+    #the new queues are added to the output file if we are resuming
+    #and it was already started
+    append = config["resume"] and os.path.isfile(config["output_file"]) and (os.path.getsize(config["output_file"]) > 0)
+    if config["output_format"] == "csv":
+        output = OutputFile(config["output_file"], make_header(), append=append)
+    elif config["output_format"] == "npy":
+        output = ColumnarOutputFile(config["output_file"], config["code_width"], append=append)
+    else:
+        assert False
+    if config["instrument"]:
+        instrumentation = Instrumentation(config["progress_interval"])
+    else:
+        instrumentation = None
+    accepted_nb = len(accepted)
+    next_checkpoint = perf_counter() + config["checkpoint_interval"]
+    #each queue comes with a copy of position, which tells where 
+    #the next queue will come from (position itself may be ahead, if
+    #the queues are buffered)
+    current = dict(position)
+    stages = ((new_queue, dict(position)) for new_queue in generate(config, apps, band_getter, decision_table, instrumentation, accepted, position))
+    if config["pipeline_buffer"] > 0:
+        stages = buffered(stages, config["pipeline_buffer"])
+    try:
+        for new_queue, current in stages:
+            output.write_queue(new_queue)
+            accepted_nb += 1
+            if (config["checkpoint_file"] is not None) and (perf_counter() >= next_checkpoint):
+                write_checkpoint(config["checkpoint_file"], config["output_file"], config["output_format"], output.sync(), accepted_nb, current)
+                next_checkpoint = perf_counter() + config["checkpoint_interval"]
+    finally:
+        stages.close()
+        #the file is left valid (with the queues written so far)
+        #even if the generation fails
+        output.close()
+    if config["checkpoint_file"] is not None:
+        write_checkpoint(config["checkpoint_file"], config["output_file"], config["output_format"], os.path.getsize(config["output_file"]), accepted_nb, current)
+    if instrumentation is not None:
+        instrumentation.write_report(config["report_file"])
+    return accepted_nb
+
+#returns the (attribute, comparison, value) of a filter written as 
+#"attribute<comparison>value", for instance "mckp_metrics.median_njobs>=2"
+def parse_filter(text):
+    match = re.fullmatch(r"\s*([\w.]+)\s*(<=|>=|==|!=|<|>)\s*(\S+)\s*", text)
+    if match is None:
+        raise argparse.ArgumentTypeError("invalid filter: "+text)
+    attribute, comparison, value = match.groups()
+    for convert in [int, float]:
+        try:
+            return (attribute, comparison, convert(value))
+        except ValueError:
+            pass
+    return (attribute, comparison, value)
+
+#returns the configuration given by the command line arguments (a list
+#of str, by default the ones of this process). Parameters that are not
+#given keep the values of the PARAMETERS section
+def parse_arguments(arguments=None):
+    defaults = make_config()
+    parser = argparse.ArgumentParser(description="Generates random queues of jobs and evaluates them with the baseline and the mckp I/O forwarding policies. The default values come from the PARAMETERS section of this file.")
+    parser.add_argument("--input-file", help="runtime database (default: %(default)s)")
+    parser.add_argument("--catalog-cache", help="directory of the compiled catalog, \"none\" to parse the input files every time (default: %(default)s)")
+    parser.add_argument("--output-file", help="(default: %(default)s)")
+    parser.add_argument("--output-format", choices=["csv", "npy"], help="(default: %(default)s)")
+    parser.add_argument("--code-width", type=int, help="initial width of the column of the encoded queues with the npy format, it grows as needed (default: %(default)s)")
+    parser.add_argument("--debug", action="store_true")
+    parser.add_argument("--node-nb", type=int, help="number of processing nodes (default: %(default)s)")
+    parser.add_argument("--ion-nb", type=int, help="number of I/O nodes (default: %(default)s)")
+    parser.add_argument("--minimum-time", type=float, help="minimum experiment execution time in seconds (default: %(default)s)")
+    parser.add_argument("--summary-method", choices=["median", "mean"], help="(default: %(default)s)")
+    parser.add_argument("--queue-nb", type=int, help="number of queues to generate (default: %(default)s)")
+    parser.add_argument("--precompute-decisions", action="store_true")
+    parser.add_argument("--lazy-simulation", action="store_true")
+    parser.add_argument("--exact-durations", action="store_true")
+    parser.add_argument("--summary-metrics", action="store_true", help="keep only running summaries of the simulations (see Metrics)")
+    parser.add_argument("--dedup-mode", choices=["set", "fingerprint", "bloom"], help="(default: %(default)s)")
+    parser.add_argument("--mckp-policy", choices=["mckp", "sparse_mckp", "greedy_mckp"], help="(default: %(default)s)")
+    parser.add_argument("--queue-sampler", choices=["rejection", "covering"], help="(default: %(default)s)")
+    parser.add_argument("--simulation-memo", type=int, help="maximum number of simulation snapshots kept, 0 to disable (default: %(default)s)")
+    parser.add_argument("--batch-simulation", type=int, help="number of queues simulated together, 0 to simulate them one by one (default: %(default)s)")
+    parser.add_argument("--worker-nb", type=int, help="number of processes (default: %(default)s)")
+    parser.add_argument("--pipeline-buffer", type=int, help="queues generated ahead by another thread while the output is written, 0 to disable (default: %(default)s)")
+    parser.add_argument("--random-seed", type=int, help="(default: %(default)s)")
+    parser.add_argument("--filter", dest="queue_filters", action="append", type=parse_filter, help="a filter such as \"mckp_metrics.median_njobs>=2\", can be repeated, replaces the default filters (default: "+str(defaults["queue_filters"])+")")
+    parser.add_argument("--instrument", action="store_true")
+    parser.add_argument("--progress-interval", type=float, help="(default: %(default)s)")
+    parser.add_argument("--report-file", help="(default: %(default)s)")
+    parser.add_argument("--checkpoint-file", help="where the progress is saved, to resume the run later (default: %(default)s)")
+    parser.add_argument("--checkpoint-interval", type=float, help="seconds between checkpoints (default: %(default)s)")
+    parser.add_argument("--resume", action="store_true", help="keep the queues in the output file and add new ones until there are queue_nb of them")
+    parser.set_defaults(**defaults)
+    #the filters given in the command line replace the default ones
+    parser.set_defaults(queue_filters=None)
+    config = vars(parser.parse_args(arguments))
+    if config["catalog_cache"] == "none":
+        config["catalog_cache"] = None
+    if config["queue_filters"] is None:
+        config["queue_filters"] = defaults["queue_filters"]
+    return config
+
+def main(arguments=None):
+    run(parse_arguments(arguments))
 
-    
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from random import seed,getstate,setstate
+from job_queue import Queue
+from filters import passes_filters
+from pipeline import batch_filter_stage
+from instrumentation import Instrumentation
+from simulation_memo import SimulationMemo
+
+#the arguments to the Queue constructor used by a worker process, the
+#filters it applies, and whether it is instrumented. They are set once
+#per worker by init_worker, so the applications and the bandwidth
+#information are not sent again with every task
+worker_args = None
+worker_filters = None
+worker_instrumented = False
+worker_mckp_policy = "mckp"
+worker_sampler = "rejection"
+worker_memo = None
+worker_summary_only = False
+worker_batch_simulation = False
+
+def init_worker(apps, node_nb, ion_nb, minimum_time, debug, band_getter, decision_table, lazy_simulation, exact_durations, queue_filters, instrumented=False, mckp_policy="mckp", sampler="rejection", memo_size=0, summary_only=False, batch_simulation=False):
+    global worker_args, worker_filters, worker_instrumented, worker_mckp_policy, worker_sampler, worker_memo, worker_summary_only, worker_batch_simulation
+    worker_args = (apps, node_nb, ion_nb, minimum_time, debug, band_getter, decision_table, lazy_simulation, exact_durations)
+    worker_filters = queue_filters
+    worker_instrumented = instrumented
+    worker_mckp_policy = mckp_policy
+    worker_sampler = sampler
+    worker_summary_only = summary_only
+    worker_batch_simulation = batch_simulation
+    if memo_size > 0:
+        worker_memo = SimulationMemo(memo_size)
+    else:
+        worker_memo = None
+
+#returns the seed of the random stream used by a task. It depends only
+#on the master seed and on the task number, so the generated queues do
+#not depend on which worker runs the task (nor on how many workers
+#there are)
+def task_seed(master_seed, task):
+    return str(master_seed)+":"+str(task)
+
+#executed by the workers: generates batch_size queues and returns the
+#ones that pass the filters, with all their metrics computed, and the
+#Instrumentation of this task (None if the worker is not instrumented).
+#With worker_batch_simulation, the queues of the task are simulated
+#together (see batch_filter_stage in pipeline.py), which gives the same
+#queues.
+#The returned queues are pickled back to the main process, so they must
+#not reference the Bandwidth (compute_all drops the arguments of the
+#stages and summarize_policy_metrics the Bandwidth of the Metrics)
+def make_queues(master_seed, task, batch_size):
+    seed(task_seed(master_seed, task))
+    if worker_instrumented:
+        instrumentation = Instrumentation()
+    else:
+        instrumentation = None
+    queues = (Queue(*worker_args, instrumentation=instrumentation, mckp_policy=worker_mckp_policy, sampler=worker_sampler, memo=worker_memo, summary_only=worker_summary_only) for i in range(batch_size))
+    if worker_batch_simulation:
+        queues = batch_filter_stage(queues, worker_filters, batch_size, instrumentation)
+    else:
+        queues = (new_queue for new_queue in queues if passes_filters(new_queue, worker_filters, instrumentation))
+    ret = []
+    for new_queue in queues:
+        new_queue.compute_all()
+        ret.append(new_queue)
+    if (instrumentation is not None) and (worker_memo is not None):
+        worker_memo.record(instrumentation)
+    return ret, instrumentation
+
+#yields random Queue objects forever, generated in this process. If
+#random_seed is None, the random number generator is seeded from the
+#system (so the run cannot be reproduced). If a Deduplicator is given,
+#queues it contains are discarded before being simulated. If an 
+#Instrumentation is given, the generation is recorded in it. 
+#mckp_policy is the policy used for the mckp metrics and sampler how the
+#jobs are drawn (see Queue). memo is an optional SimulationMemo used by
+#the simulations, and summary_only tells if their Metrics keep only 
+#summaries (see Metrics). If position (a dict) has a "random_state"
+#(from random.getstate), the generation continues from that state
+#instead of starting from random_seed. When each queue is yielded, 
+#position["random_state"] is the state the next queue will be generated
+#from, so a checkpoint can save it
+def generate_serially(apps, node_nb, ion_nb, minimum_time, debug, band_getter, decision_table=None, lazy_simulation=False, exact_durations=False, random_seed=None, deduplicator=None, instrumentation=None, mckp_policy="mckp", sampler="rejection", position=None, memo=None, summary_only=False):
+    if (position is not None) and ("random_state" in position):
+        setstate(position["random_state"])
+    else:
+        seed(random_seed)
+    while True:
+        new_queue = Queue(apps, node_nb, ion_nb, minimum_time, debug, band_getter, decision_table, lazy_simulation, exact_durations, deduplicator, instrumentation, mckp_policy, sampler, memo, summary_only)
+        if position is not None:
+            position["random_state"] = getstate()
+        yield new_queue
+
+#yields random Queue objects forever, generated (and simulated with
+#both policies) by a pool of worker_nb processes. Only the queues that
+#pass queue_filters (see filters.py) are sent back by the workers. Work is split into
+#tasks of batch_size queues, each with its own random stream derived
+#from master_seed (see task_seed). Queues are yielded in task order, so
+#the sequence is the same for a given master_seed. At most
+#2*worker_nb tasks are in flight at any moment; when the consumer
+#stops (closes the generator), the remaining ones are cancelled.
+#The workers do not know which queues were accepted, so duplicates are
+#only detected by the consumer, after they were simulated. If an
+#Instrumentation is given, what the workers recorded is added to it as
+#their results arrive. If position (a dict) has a "task" and an "index",
+#the generation continues from there: the tasks before task and the 
+#first index queues sent back by task are skipped. When each queue is
+#yielded, they give the position of the next queue, so a checkpoint can
+#save them. With memo_size > 0, each worker has a SimulationMemo with 
+#that capacity. With summary_only, the Metrics of the queues (which are
+#sent back by the workers) keep only summaries. With batch_simulation,
+#the queues of each task are simulated together (see make_queues).
+def generate_in_parallel(apps, node_nb, ion_nb, minimum_time, debug, band_getter, decision_table, lazy_simulation, exact_durations, queue_filters, master_seed, worker_nb, batch_size=8, instrumentation=None, mckp_policy="mckp", sampler="rejection", position=None, memo_size=0, summary_only=False, batch_simulation=False):
+    executor = ProcessPoolExecutor(max_workers=worker_nb, initializer=init_worker, initargs=(apps, node_nb, ion_nb, minimum_time, debug, band_getter, decision_table, lazy_simulation, exact_durations, queue_filters, instrumentation is not None, mckp_policy, sampler, memo_size, summary_only, batch_simulation))
+    try:
+        if position is None:
+            position = {}
+        current = position.get("task", 0)
+        skipped = position.get("index", 0)
+        pending = deque()
+        task = current
+        while True:
+            while len(pending) < 2*worker_nb:
+                pending.append(executor.submit(make_queues, master_seed, task, batch_size))
+                task += 1
+            new_queues, worker_instrumentation = pending.popleft().result()
+            if instrumentation is not None:
+                instrumentation.merge(worker_instrumentation)
+            for index in range(skipped, len(new_queues)):
+                if index+1 < len(new_queues):
+                    position["task"], position["index"] = current, index+1
+                else:
+                    position["task"], position["index"] = current+1, 0
+                yield new_queues[index]
+            current += 1
+            skipped = 0
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,71 @@
+from policy import mckp_job_options, fill_first_mckp_layer, fill_mckp_layer, mckp_backtrack
+
+class IncrementalMCKP:
+	"""
+	Solves the mckp policy (see mckp_policy in policy.py) for the
+	successive sets of running jobs of a simulation, keeping the
+	layers of the dynamic program between calls.
+
+	The layer of a job only depends on the jobs before it in the
+	list, and between two calls to the policy the list of running
+	jobs usually changes only at its end (new jobs are appended) or
+	by losing a few jobs. So we keep the layers of the longest
+	prefix that did not change and only compute the ones after it:
+	a single layer when a job arrives, and the layers after the
+	removed job when one departs. The decisions are exactly the
+	ones of mckp_policy (with vectorized=True) for the same list.
+
+	...
+
+	Attributes
+	----------
+	ion_nb : int
+		number of I/O nodes
+	bandwidth_getter : Bandwidth
+		used to obtain the options of each job
+	jobs : List[Job]
+		the jobs of the layers that are kept, in order
+	values, weight : List[List[int]]
+		the options of each of these jobs (see mckp_job_options)
+	rows : List[numpy.ndarray]
+		the row of the table of each of these jobs
+	solutions : List[numpy.ndarray]
+		the layer of the solution table of each of these jobs
+	computed_layers : int
+		how many layers were computed so far
+
+	Methods
+	-------
+	solve(job_list)
+		returns the decision of the mckp policy for job_list
+	"""
+	def __init__(self, ion_nb, bandwidth_getter):
+		self.ion_nb = ion_nb
+		self.bandwidth_getter = bandwidth_getter
+		self.jobs = []
+		self.values = []
+		self.weight = []
+		self.rows = []
+		self.solutions = []
+		self.computed_layers = 0
+
+	def solve(self, job_list):
+		#the layers of the prefix that did not change are kept
+		kept = 0
+		while (kept < len(self.jobs)) and (kept < len(job_list)) and (self.jobs[kept] is job_list[kept]):
+			kept += 1
+		for layers in [self.jobs, self.values, self.weight, self.rows, self.solutions]:
+			del layers[kept:]
+		for job in job_list[kept:]:
+			values, weight = mckp_job_options(job, self.bandwidth_getter)
+			if len(self.rows) == 0:
+				row, solutions = fill_first_mckp_layer(values, weight, self.ion_nb)
+			else:
+				row, solutions = fill_mckp_layer(self.rows[-1], values, weight, self.ion_nb)
+			self.jobs.append(job)
+			self.values.append(values)
+			self.weight.append(weight)
+			self.rows.append(row)
+			self.solutions.append(solutions)
+			self.computed_layers += 1
+		return mckp_backtrack(job_list, self.values, self.weight, self.solutions, self.ion_nb)
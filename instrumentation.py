@@ -0,0 +1,133 @@
+import json
+import time
+from policy import MCKP_POLICIES
+
+class Instrumentation:
+	"""
+	Counters and timers of the generation of queues, used to find
+	out where the time goes during a run. It is optional: the code
+	that records something receives an Instrumentation object, and
+	does nothing when it gets None instead, so runs without it do
+	not pay for it. Everything is recorded once per queue (not once
+	per simulation event), to keep the overhead low.
+
+	Counters used by the code:
+	- "queue_attempts": calls to make_a_queue
+	- "coverage_retries": queues discarded because not all
+	  applications were present
+	- "duplicates": queues discarded because they were already
+	  generated
+	- "filtered": queues rejected by a filter (also counted by
+	  filter, as "filtered: <filter>")
+	- "accepted": queues written to the output
+	- "simulations": calls to the simulation functions
+	- "simulation_events", "<policy>_policy_calls": calls to the
+	  policies, which happen at every event of the simulation
+	- "mckp_solves", "mckp_lookups": calls to the MCKP policies
+	  (any of MCKP_POLICIES, see policy.py) that solved the 
+	  problem or found the answer in a DecisionTable
+	- "mckp_table_misses": the solves that happened because the
+	  set of applications was missing from a lazy DecisionTable
+	  (see decision_table.py)
+	- "policy_job_decisions": total number of jobs given to the
+	  policies. The number of bandwidth lookups is proportional to
+	  it
+	- "memo_hits", "memo_misses", "memo_skipped_apps", 
+	  "memo_evictions": use of the SimulationMemo, if there is one
+	  (see simulation_memo.py)
+	Timers (in seconds) are "generation" (making queues, including
+	retries) and one per stage of the Queue (see Queue.STAGES). With
+	several worker processes, the timers are summed over the
+	workers.
+
+	Attributes
+	----------
+	counters : dict {str, int}
+	timers : dict {str, float}
+	start : float
+		when this object was created (time.perf_counter)
+	progress_interval : float
+		minimum number of seconds between two progress lines
+	next_progress : float
+		when the next progress line can be printed
+
+	Methods
+	-------
+	count(name, amount=1)
+		adds amount to the counter name
+	add_time(name, seconds)
+		adds seconds to the timer name
+	record_simulation(policy, metrics, decision_table, table_misses)
+		updates the counters with a finished simulation
+	merge(other)
+		adds the counters and timers of other to this one
+	progress(done, total)
+		prints a progress line if progress_interval seconds
+		passed since the previous one
+	report()
+		returns a dict with everything that was recorded
+	write_report(filename)
+		writes the report as JSON
+	"""
+	def __init__(self, progress_interval=10.0):
+		self.counters = {}
+		self.timers = {}
+		self.start = time.perf_counter()
+		self.progress_interval = progress_interval
+		self.next_progress = self.start + progress_interval
+
+	def count(self, name, amount=1):
+		self.counters[name] = self.counters.get(name, 0) + amount
+
+	def add_time(self, name, seconds):
+		self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+	def record_simulation(self, policy, metrics, decision_table=None, table_misses=0):
+		"""
+		policy is the policy of the simulation, decision_table
+		the DecisionTable it used (if any) and table_misses how
+		many of its lookups were missing from the table.
+		"""
+		self.count("simulations")
+		self.count("simulation_events", metrics.policy_calls)
+		self.count(policy+"_policy_calls", metrics.policy_calls)
+		self.count("policy_job_decisions", metrics.total_njobs)
+		if policy in MCKP_POLICIES:
+			if decision_table is None:
+				self.count("mckp_solves", metrics.policy_calls)
+			else:
+				self.count("mckp_solves", table_misses)
+				self.count("mckp_table_misses", table_misses)
+				self.count("mckp_lookups", metrics.policy_calls - table_misses)
+
+	def merge(self, other):
+		for name in other.counters:
+			self.count(name, other.counters[name])
+		for name in other.timers:
+			self.add_time(name, other.timers[name])
+
+	def progress(self, done, total):
+		now = time.perf_counter()
+		if now < self.next_progress:
+			return
+		self.next_progress = now + self.progress_interval
+		elapsed = now - self.start
+		line = "["+("%.1f" % elapsed)+"s] "+str(done)+"/"+str(total)+" queues"
+		for name in ["queue_attempts", "coverage_retries", "duplicates", "filtered"]:
+			line += ", "+str(self.counters.get(name, 0))+" "+name.replace("_", " ")
+		line += ", "+("%.2f" % (done/elapsed))+" queues/s"
+		print(line, flush=True)
+
+	def report(self):
+		elapsed = time.perf_counter() - self.start
+		ret = {"elapsed" : elapsed,
+			"counters" : dict(self.counters),
+			"timers" : dict(self.timers)}
+		if (elapsed > 0) and ("accepted" in self.counters):
+			ret["accepted_per_second"] = self.counters["accepted"]/elapsed
+		return ret
+
+	def write_report(self, filename):
+		arq = open(filename, "w")
+		json.dump(self.report(), arq, indent=1)
+		arq.close()
@@ -29,6 +29,11 @@ class Job:
 	previous_event : float
 		the clock of when the previous change in the number of 
 		I/O nodes was made. Used to estimate the progress.
+	runtime : float
+		the runtime of the application with ion I/O nodes 
+		(None before ion is set). It is kept here so the 
+		runtime dict of the Application is only looked up when
+		ion changes, not at every event of the simulation
 
 	Methods
 	-------
@@ -43,13 +48,20 @@ class Job:
 		nodes (see update_progress for an explanation), return
 		the clock of the moment when this job is 
 		expected to finish its execution.
+	copy():
+		returns a new Job in the same state
 	"""
+	#jobs are created for every application scheduled in every
+	#simulation, so they have no __dict__
+	__slots__ = ("jobid", "start_time", "previous_event", "app", "ion", "done", "runtime")
+
 	def __init__(self, jobid, start_time, app, ion=-1):
 		self.jobid = jobid
 		self.start_time = start_time
 		self.previous_event = start_time
 		self.app = app
 		self.ion = ion
+		self.runtime = app.runtime.get(ion)
 		self.done = 0.0
 
 	def update_progress(self, clock):
@@ -71,8 +83,7 @@ class Job:
 			the current clock
 		"""
 		if clock > self.previous_event:
-			runtime = self.app.runtime[self.ion]
-			self.done += (float(clock)-self.previous_event)/runtime
+			self.done += (float(clock)-self.previous_event)/self.runtime
 			assert self.done < 1.0 #it should not be 
 				#possible for jobs to have ended when
 				#we call this because we do this 
@@ -94,6 +105,7 @@ class Job:
 					#with this number of I/O  nodes
 		self.update_progress(clock)
 		self.ion = ion
+		self.runtime = self.app.runtime[ion]
 		self.previous_event = clock
 
 	def estimate_end_time(self):
@@ -103,5 +115,15 @@ class Job:
 		the clock of the moment when this job is 
 		expected to finish its execution
 		"""
-		runtime = self.app.runtime[self.ion]
-		return self.previous_event + ((1.0 - self.done)*runtime)
+		return self.previous_event + ((1.0 - self.done)*self.runtime)
+
+	def copy(self):
+		"""
+		Returns a new Job in the same state as this one (used to
+		resume simulations from a snapshot, see 
+		simulation_memo.py)
+		"""
+		ret = Job(self.jobid, self.start_time, self.app, self.ion)
+		ret.previous_event = self.previous_event
+		ret.done = self.done
+		return ret
@@ -0,0 +1,437 @@
+from math import comb
+from random import randint,sample,getstate,setstate
+from functools import partial
+from time import perf_counter
+from numpy import median,mean
+from application import Application
+from application_encode import encode_application
+from policy_simulation import simulate_execution_with_policy,simulate_execution_lazily
+from metrics import Metrics
+from makespan_estimator import MakespanEstimator
+from batch_simulation import simulate_batch,BATCH_POLICIES
+from decision_table import DecisionTable
+
+class Queue:
+	"""
+	A list of jobs to be executed in order
+
+	...
+
+	Attributes
+	----------
+	jobs : List[Application]
+		the queue as an ordered list of Application objects
+	min_makespan : float
+		a lower bound for the execution time of this queue. It 
+		cannot be shorter than this (but this lower bound 
+		itself may be impossible to attain)
+	max_makespan : float
+		an upper bound for the execution time of this queue. It
+		cannot be longer than this (but this upper bound itself
+		may be impossible to attain)
+	baseline_metrics : Metrics
+		metrics obtained from simulating the generated queue 
+		with the baseline policy (where the connection between 
+		computing and I/O nodes is fixed
+	mckp_metrics : Metrics
+		metrics obtained from simulating the generated queue
+		with the mckp policy
+
+	Only jobs is obtained when the object is created. The other
+	attributes are computed in stages (see STAGES), the first time
+	they are used (or when compute is called). That way, a queue
+	discarded by a cheap filter never pays for the simulations (see
+	filters.py).
+	"""
+	#the stages that can be computed for a queue (from the cheapest
+	#to the most expensive) and the attributes each of them gives
+	STAGES = {"encoding" : ["jobs"],
+		"makespan" : ["min_makespan", "max_makespan"],
+		"baseline" : ["baseline_metrics"],
+		"mckp" : ["mckp_metrics"]}
+
+	def __init__(self, apps, node_nb, ion_nb, min_time, debug, bandwidth_getter, decision_table=None, lazy_simulation=False, exact_durations=False, deduplicator=None, instrumentation=None, mckp_policy="mckp", sampler="rejection", memo=None, summary_only=False):
+		"""
+		Generates a random queue respecting given constraints.
+		Some metrics on this queue, that will eventually allow
+		us to select the best queues, are calculated later (see
+		compute).
+		Additional rules : 
+		1. all applications must be executed at least once 
+		   during the experiment
+
+		Parameters
+		----------
+		apps : List[Application]
+			a list of Application objects
+		node_nb : int
+			the number of processing nodes 
+		min_time : float
+			the minimum duration for the experiment in 
+			seconds
+		decision_table : DecisionTable
+			optional precomputed decisions for the mckp 
+			policy (see decision_table.py)
+		lazy_simulation : boolean
+			if True, the simulations are done with 
+			simulate_execution_lazily instead of
+			simulate_execution_with_policy
+		exact_durations : boolean
+			if True, the bandwidth metrics are weighted by
+			the exact duration of each period instead of 
+			by whole seconds (see Metrics)
+		deduplicator : Deduplicator
+			if given, queues that it already contains are
+			discarded right after being generated (before
+			being simulated), and a new one is generated
+		instrumentation : Instrumentation
+			if given, the attempts, retries, and the time
+			spent in each stage are recorded in it (see
+			instrumentation.py)
+		mckp_policy : str
+			the policy used for the mckp_metrics, "mckp",
+			"sparse_mckp" or "greedy_mckp" (see policy.py).
+			"greedy_mckp" is approximate, it also returns
+			the upper bound of the linear relaxation, so the
+			mckp_metrics have its optimality gap (mean_gap
+			and max_gap, see Metrics)
+		sampler : str
+			how the jobs are drawn: "rejection" makes queues
+			with make_a_queue until one has all applications,
+			"covering" makes one that has them by
+			construction (see make_a_covering_queue)
+		memo : SimulationMemo
+			if given, the simulations start from the 
+			snapshot of the longest prefix of this queue 
+			that was simulated before, if there is one (see
+			simulation_memo.py). It is not used with 
+			lazy_simulation
+		summary_only : boolean
+			if True, the Metrics keep only summaries of the
+			simulations instead of lists with every event 
+			(see Metrics)
+		"""
+		if instrumentation is not None:
+			start = perf_counter()
+		done = False
+		while not done:
+			if debug:
+				print("will generate a queue...")
+			if sampler == "covering":
+				self.jobs = make_a_covering_queue(apps, node_nb, min_time, debug)
+			else:
+				self.jobs = make_a_queue(apps, node_nb, min_time, debug)
+			if instrumentation is not None:
+				instrumentation.count("queue_attempts")
+			if debug:
+				print("generated a queue of "+str(len(self.jobs))+" jobs")
+			done = are_all_applications_executed(self.jobs, apps)
+			if not done:
+				if instrumentation is not None:
+					instrumentation.count("coverage_retries")
+				if debug:
+					print("Made a queue of "+str(len(self.jobs))+" jobs, but not all applications are present, so we'll try again.")
+			if done and (deduplicator is not None) and deduplicator.contains(self.encode()):
+				done = False
+				if instrumentation is not None:
+					instrumentation.count("duplicates")
+				if debug:
+					print("Made a queue that was already generated, so we'll try again.")
+		if instrumentation is not None:
+			instrumentation.add_time("generation", perf_counter() - start)
+		if lazy_simulation:
+			simulate = simulate_execution_lazily
+		elif memo is not None:
+			simulate = partial(simulate_execution_with_policy, memo=memo)
+		else:
+			simulate = simulate_execution_with_policy
+		if summary_only:
+			simulate = partial(simulate, summary_only=True)
+		#what we need to compute the other stages
+		self.stage_args = (node_nb, ion_nb, debug, bandwidth_getter, decision_table, simulate, exact_durations, mckp_policy)
+		self.computed = {}
+		self.instrumentation = instrumentation
+	
+	def compute(self, stage):
+		"""
+		Computes the attributes given by stage (see STAGES), if
+		it was not done yet.
+		"""
+		if (stage == "encoding") or (stage in self.computed):
+			return
+		node_nb, ion_nb, debug, bandwidth_getter, decision_table, simulate, exact_durations, mckp_policy = self.stage_args
+		if self.instrumentation is not None:
+			start = perf_counter()
+			if decision_table is not None:
+				misses = decision_table.misses
+		if stage == "makespan":
+			self.computed["min_makespan"] = calculate_makespan(self.jobs, node_nb, "best")
+			self.computed["max_makespan"] = calculate_makespan(self.jobs, node_nb, "worst")
+		elif stage == "baseline":
+			if debug:
+				print("Will simulate it with the baseline policy")
+			self.computed["baseline_metrics"] = simulate(self.jobs, node_nb, ion_nb, "baseline", bandwidth_getter, exact_durations=exact_durations)
+		elif stage == "mckp":
+			if debug:
+				print("Will simulate it with the mckp policy")
+			self.computed["mckp_metrics"] = simulate(self.jobs, node_nb, ion_nb, mckp_policy, bandwidth_getter, decision_table=decision_table, exact_durations=exact_durations)
+		else:
+			assert False
+		self.computed[stage] = True
+		if self.instrumentation is not None:
+			self.instrumentation.add_time(stage, perf_counter() - start)
+			if stage == "baseline":
+				self.instrumentation.record_simulation("baseline", self.computed["baseline_metrics"])
+			elif stage == "mckp":
+				if decision_table is not None:
+					misses = decision_table.misses - misses
+				else:
+					misses = 0
+				self.instrumentation.record_simulation(mckp_policy, self.computed["mckp_metrics"], decision_table, misses)
+
+	def compute_all(self):
+		"""
+		Computes all stages. After that, the parameters used to
+		compute them (and the Instrumentation) are no longer 
+		kept.
+		"""
+		for stage in self.STAGES:
+			self.compute(stage)
+		self.stage_args = None
+		self.instrumentation = None
+
+	@property
+	def min_makespan(self):
+		self.compute("makespan")
+		return self.computed["min_makespan"]
+
+	@property
+	def max_makespan(self):
+		self.compute("makespan")
+		return self.computed["max_makespan"]
+
+	@property
+	def baseline_metrics(self):
+		self.compute("baseline")
+		return self.computed["baseline_metrics"]
+
+	@property
+	def mckp_metrics(self):
+		self.compute("mckp")
+		return self.computed["mckp_metrics"]
+
+	def encode(self):
+		"""
+		returns a string representation of this queue as a 
+		series of letters, where each letter represents an 
+		application.
+		"""
+		encoded_list = [encode_application(app) for app in self.jobs]
+		ret = ""
+		for elem in encoded_list:
+			ret+= elem
+		return ret
+
+	def get_output_values(self, encoded):
+		"""
+		Returns a tuple with the information about this queue 
+		that is written to the output file, in the order of the
+		columns of the output (see make_header in 
+		generate_queues.py).
+		
+		Parameters
+		----------
+		encoded : str
+			the output obtained from calling the method 
+			encode of this object
+		"""
+		assert encoded != ""
+		return (encoded, 
+			len(self.jobs),
+			self.min_makespan,
+			self.max_makespan,
+			self.baseline_metrics.makespan,
+			self.mckp_metrics.makespan,
+			self.baseline_metrics.mean_bandwidth,
+			self.mckp_metrics.mean_bandwidth,
+			self.baseline_metrics.median_bandwidth,
+			self.mckp_metrics.median_bandwidth,
+			self.baseline_metrics.max_bandwidth,
+			self.mckp_metrics.max_bandwidth,
+			self.mckp_metrics.policy_calls,
+			self.mckp_metrics.changes,
+			self.mckp_metrics.median_period,
+			self.mckp_metrics.mean_period,
+			self.mckp_metrics.median_njobs,
+			self.mckp_metrics.mean_njobs)
+
+	def get_output_line(self, encoded):
+		"""
+		Returns the string ready to be written to the output 
+		file, containing information about this queue.
+		
+		Parameters
+		----------
+		encoded : str
+			the output obtained from calling the method 
+			encode of this object
+		"""
+		ret = ""
+		for value in self.get_output_values(encoded):
+			ret += str(value)+";"
+		return ret+"\n"	
+
+#computes stage ("baseline" or "mckp", see Queue.STAGES) for the Queue
+#objects of the list queues that did not compute it yet, simulating all
+#of them at once with simulate_batch (see batch_simulation.py), which
+#gives the same Metrics as simulating them one by one. The queues must
+#have been made with the same parameters. If simulate_batch cannot do
+#what they were made for (lazy_simulation, a memo, summary_only, or a
+#mckp_policy it does not apply), they are computed one by one. Without
+#a DecisionTable, the sets of applications of the batch are solved once
+#each, in a lazy DecisionTable made for the batch
+def compute_in_batch(queues, stage):
+	pending = [queue for queue in queues if not (stage in queue.computed)]
+	if len(pending) == 0:
+		return
+	node_nb, ion_nb, debug, bandwidth_getter, decision_table, simulate, exact_durations, mckp_policy = pending[0].stage_args
+	if stage == "baseline":
+		policy = "baseline"
+	else:
+		policy = mckp_policy
+	if (simulate is not simulate_execution_with_policy) or not (policy in BATCH_POLICIES):
+		for queue in pending:
+			queue.compute(stage)
+		return
+	if debug:
+		print("Will simulate "+str(len(pending))+" queues with the "+policy+" policy")
+	start = perf_counter()
+	if (policy != "baseline") and (decision_table is None):
+		decision_table = DecisionTable([], node_nb, ion_nb, bandwidth_getter, policy=policy, lazy=True)
+	if decision_table is not None:
+		misses = decision_table.misses
+	all_metrics = simulate_batch([queue.jobs for queue in pending], node_nb, ion_nb, policy, bandwidth_getter, decision_table, exact_durations)
+	#the time is shared by the queues, and the lookups that missed
+	#the table are not known by queue, so they are counted with the
+	#first ones (the counters are totals)
+	elapsed = (perf_counter() - start)/len(pending)
+	if decision_table is not None:
+		misses = decision_table.misses - misses
+	for queue, metrics in zip(pending, all_metrics):
+		queue.computed[stage+"_metrics"] = metrics
+		queue.computed[stage] = True
+		if queue.instrumentation is not None:
+			queue.instrumentation.add_time(stage, elapsed)
+			if policy == "baseline":
+				queue.instrumentation.record_simulation("baseline", metrics)
+			else:
+				queue_misses = min(misses, metrics.policy_calls)
+				misses -= queue_misses
+				queue.instrumentation.record_simulation(policy, metrics, decision_table, queue_misses)
+
+#given a queue of jobs to be executed, answer if all applications in 
+#the apps list are present among these jobs.
+def are_all_applications_executed(queue, apps):
+	present = {}
+	for app in queue:
+		present[app] = True
+	if len(list(present.keys())) != len(apps):
+		return False
+	else:
+		return True
+
+#generates and returns a random queue of jobs running applications 
+#among the ones listed in apps on a cluster or node_nb processing 
+#nodes. The generated queue must respect a constraints : the
+#optimistic execution time must be longer or equal to min_time
+def make_a_queue(apps, node_nb, min_time, debug=False):
+	queue = []
+	#the makespan is calculated incrementally as we add stuff to 
+	#the queue, instead of replaying the whole queue each time
+	estimator = MakespanEstimator(node_nb, "best")
+	while estimator.makespan() < min_time:
+		app = randint(0,len(apps)-1)
+		queue.append(apps[app])
+		estimator.append(apps[app])
+		if debug:
+			print("adding a job for application "+str(apps[app])+", now our optimistic execution time is "+str(estimator.makespan()))
+	return queue
+
+#generates and returns a random queue like make_a_queue, but that
+#contains all applications by construction, so it never has to be
+#discarded. Applications are drawn uniformly and appended, exactly as
+#make_a_queue does (with the same random numbers, so the queue starts
+#with the one make_a_queue would return), until the optimistic
+#execution time reaches min_time. Then one job of each application that
+#is missing is appended, in a uniformly random order. Appending a job
+#cannot make the optimistic execution time grow by more than its
+#runtime (it starts at the latest when all the jobs before it ended), so
+#the queue overshoots min_time by less than the best runtime of the 
+#last drawn job plus the best runtimes of the appended missing ones.
+#This is not the distribution of the rejection sampler (make_a_queue 
+#conditioned on all applications being present), which favors the 
+#queues that reached min_time only after many jobs, while here the
+#missing applications are added at the end
+def make_a_covering_queue(apps, node_nb, min_time, debug=False):
+	queue = []
+	present = set()
+	estimator = MakespanEstimator(node_nb, "best")
+	while estimator.makespan() < min_time:
+		app = randint(0,len(apps)-1)
+		queue.append(apps[app])
+		present.add(app)
+		estimator.append(apps[app])
+		if debug:
+			print("adding a job for application "+str(apps[app])+", now our optimistic execution time is "+str(estimator.makespan()))
+	missing = [app for app in range(len(apps)) if not (app in present)]
+	for app in sample(missing, len(missing)):
+		queue.append(apps[app])
+		if debug:
+			print("adding a job for the missing application "+str(apps[app]))
+	return queue
+
+#returns the expected number of calls to make_a_queue needed to obtain
+#a queue with all applications (what the rejection sampler of Queue
+#does), estimated by making samples queues: it is 1/p, where p is the
+#fraction of them with all applications. If none of them has all
+#applications, p is instead approximated from their sizes: with L jobs
+#drawn uniformly among n applications, the probability that all of
+#them are present is sum_{j=0}^{n} (-1)^j C(n,j) (1-j/n)^L (inclusion-
+#exclusion). That ignores that the size of a queue depends on which
+#applications were drawn, so it is only a rough estimate. The state of
+#the random number generator is restored at the end, so calling this
+#function does not change the generated queues
+def expected_rejection_attempts(apps, node_nb, min_time, samples=1000):
+	state = getstate()
+	sizes = []
+	covered = 0
+	for i in range(samples):
+		queue = make_a_queue(apps, node_nb, min_time)
+		sizes.append(len(queue))
+		if are_all_applications_executed(queue, apps):
+			covered += 1
+	setstate(state)
+	if covered > 0:
+		return samples/covered
+	n = len(apps)
+	probability = mean([sum([(-1)**j*comb(n, j)*(1-j/n)**size for j in range(n+1)]) for size in sizes])
+	if probability <= 0:
+		return float("inf")
+	return 1/probability
+
+#play the execution of the queue with FIFO scheduler on a cluster
+#of node_nb processing nodes to see how long it
+#would take in an optimistic (which_time = "best") or pessimistic 
+#(which_time = "worst"). This estimation does NOT take into account the
+#choices that will be made by the I/O forwarding policy or the number 
+#of available I/O nodes, in fact the obtained makespan may be 
+#impossible for this queue. It is used just to give lower and upper 
+#bounds on the actually execution time of the experiment.
+#Returns the makespan
+def calculate_makespan(queue, node_nb, which_time,debug=False): 
+	if debug:
+		print("Will start the \"simulation\" with "+str(node_nb)+" nodes and queue: "+str([str(app) for app in queue]))
+	estimator = MakespanEstimator(node_nb, which_time, debug)
+	for app in queue:
+		estimator.append(app)
+	return estimator.makespan()
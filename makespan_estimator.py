@@ -0,0 +1,104 @@
+from heapq import heappop,heappush
+
+class MakespanEstimator:
+	"""
+	Plays the execution of a queue with the FIFO scheduler on a
+	cluster of node_nb processing nodes (as calculate_makespan from
+	job_queue.py does), but incrementally: applications are appended to
+	the end of the queue one at a time and the makespan of the queue
+	so far can be asked at any moment.
+
+	This works because, with FIFO, appending an application to the
+	end of the queue cannot change anything that happens before the
+	applications already in the queue are scheduled. Hence we only
+	keep the state of the "simulation" up to the moment where the
+	last application was scheduled. Each application is pushed to
+	and popped from the heap of events only once, so appending costs
+	amortized O(log n).
+
+	...
+
+	Attributes
+	----------
+	node_nb : int
+		number of processing nodes
+	which_time : str
+		"best" for an optimistic or "worst" for a pessimistic
+		estimation (see Application.get_time)
+	clock : float
+		the clock of the last event that was processed
+	events : List[(float, Application)]
+		a heap with the end of the applications that are
+		running at clock
+	available_nodes : int
+		number of processing nodes not used at clock
+	pending : List[Application]
+		applications that were appended but could not be
+		scheduled yet (in order, the first one is the head of
+		the queue)
+	last_end : float
+		the latest end time among all scheduled applications
+	debug : boolean
+		if we should print debug messages or not
+
+	Methods
+	-------
+	append(app)
+		adds app to the end of the queue
+	makespan()
+		returns the makespan of the queue so far
+	"""
+	def __init__(self, node_nb, which_time, debug=False):
+		self.node_nb = node_nb
+		self.which_time = which_time
+		self.clock = 0
+		self.events = []
+		self.available_nodes = node_nb
+		self.pending = []
+		self.last_end = 0
+		self.debug = debug
+
+	def append(self, app):
+		"""
+		Adds the Application app to the end of the queue.
+		"""
+		self.pending.append(app)
+		self.schedule_pending()
+
+	def schedule_pending(self):
+		"""
+		Schedules the pending applications in order, fast
+		forwarding to the end of running applications when
+		there are not enough available nodes for the head of
+		the queue.
+		"""
+		head = 0
+		while head < len(self.pending):
+			app = self.pending[head]
+			if app.nodes <= self.available_nodes:
+				self.available_nodes -= app.nodes
+				end_time = self.clock + app.get_time(self.which_time)
+				heappush(self.events, (end_time, app))
+				if end_time > self.last_end:
+					self.last_end = end_time
+				if self.debug:
+					print("Scheduled "+str(app) +", available = "+str(self.available_nodes))
+				head += 1
+			else:
+				#we cannot schedule more jobs, so
+				#fastforward to the moment where the next
+				#one finishes its execution
+				event = heappop(self.events)
+				self.clock = event[0]
+				self.available_nodes += event[1].nodes
+				if self.debug:
+					print("clock = "+str(self.clock)+", end of "+str(event[1])+", available = "+str(self.available_nodes))
+		del self.pending[:head]
+
+	def makespan(self):
+		"""
+		Returns the makespan of the queue so far. Since all
+		appended applications have been scheduled, that is the
+		moment the last of them finishes its execution.
+		"""
+		return self.last_end
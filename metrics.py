@@ -1,5 +1,8 @@
+from copy import copy
+import numpy
 from numpy import median,mean
 from bandwidth import Bandwidth
+from quantile_sketch import QuantileSketch
 
 class Metrics:
 	"""
@@ -9,6 +12,20 @@ class Metrics:
 	the policy is applied, and that the policy is applied every 
 	time the set of running application changes for some time.
 
+	With summary_only=True, the lists (period, njobs, bandwidth,
+	bandwidth_durations and gaps) are not kept, they are None.
+	Instead, each of them is summarized while the simulation goes
+	by a QuantileSketch (see quantile_sketch.py), which gives the
+	same means and maxima (apart from the last digits, since the
+	sums are done in another order) and the same medians while
+	there are at most 2*sketch_size distinct values. Above that,
+	the medians are approximated, and the error attributes give a
+	bound on how far they can be from the exact ones. The previous
+	decision is kept by jobid instead of by Job, so the Metrics do
+	not keep the Jobs of the simulation alive. That makes the
+	Metrics small and of fixed size, for runs that keep many
+	queues in memory.
+
 	Attributes
 	----------
 	policy_calls : int
@@ -21,6 +38,11 @@ class Metrics:
 		the policy
 	median_period and mean_period : float
 		the median and the mean of the period list
+	median_period_error : float
+		a bound on the distance between median_period and 
+		the exact median (0 unless summary_only is True and
+		the median was approximated). Likewise for 
+		median_njobs_error and median_bandwidth_error
 	makespan : float
 		the time it took to run the whole queue
 	njobs : List[int]
@@ -28,17 +50,42 @@ class Metrics:
 		call of the policy
 	median_njobs and mean_njobs : float
 		the median and the mean of the njobs list
+	total_njobs : int
+		the sum of the njobs list (kept also with 
+		summary_only)
 	changes : int
 		number of policy calls where decisions have changed for
 		at least one of the applications that were executing in
 		the last time the policy was applied 
 	last_decision : dict {Job, int}
 		we keep the previous decision so we can check what 
-		changed 
+		changed (with summary_only, it is a dict {int, int}
+		relating the jobid of each Job to its decision, and it
+		is discarded by summarize_policy_metrics)
 	bandwidth : List[float]
-		a list with the global bandwidth every second
+		the global bandwidth over time, as runs: each value 
+		was observed for the duration at the same position of
+		bandwidth_durations
+	bandwidth_durations : List[float]
+		how long each value of the bandwidth list lasted. By
+		default, that is the number of whole seconds (in the 
+		clock) covered by that period, so the statistics are
+		the same as if we had the bandwidth every second. If 
+		exact_durations is True, it is the exact duration
+	exact_durations : boolean
+		how to weight the bandwidth values (see
+		bandwidth_durations)
 	median_bandwidth, mean_bandwidth, max_bandwidth : float
-		median, mean, and maximum bandwidth
+		median, mean, and maximum bandwidth, weighted by 
+		their durations
+	gaps : List[float]
+		for approximate policies that give an upper bound on
+		the best bandwidth (see greedy_mckp_policy in 
+		policy.py), the relative optimality gap of each call: 
+		(bound - obtained bandwidth)/bound
+	mean_gap and max_gap : float
+		the mean and the maximum of the gaps list (-1 if the 
+		policy does not give bounds)
 	previous_bandwidth : float
 		used so we can register the previously obtained 
 		bandwidth for how long it happened (which we will only
@@ -46,7 +93,16 @@ class Metrics:
 	bandwidth_getter : Bandwidth
 		a reference to the Bandwidth object used to obtain 
 		bandwidth of different combinations of application
-		and number of I/O nodes
+		and number of I/O nodes (None after 
+		summarize_policy_metrics, so the final Metrics do not
+		carry a copy of it when they are pickled)
+	summary_only : boolean
+		if True, the lists are replaced by summaries
+	period_summary, njobs_summary, bandwidth_summary and 
+	gaps_summary : QuantileSketch
+		with summary_only, the summaries of the lists while
+		the simulation goes (None otherwise, and after 
+		summarize_policy_metrics)
 	
 	Methods
 	-------
@@ -57,9 +113,17 @@ class Metrics:
 		it MUST be called at the end of the simulation to 
 		calculate the means and medians, and to set the
 		makespan to clock
+	copy(jobs)
+		returns a copy of these metrics in the middle of a
+		simulation
+	summarize_sketches()
+		does what summarize_policy_metrics does, with
+		summary_only
 	"""
-	def __init__(self, bandwidth_getter):
+	def __init__(self, bandwidth_getter, exact_durations=False, summary_only=False, sketch_size=100):
 		self.bandwidth_getter = bandwidth_getter
+		self.exact_durations = exact_durations
+		self.summary_only = summary_only
 		self.policy_calls = 0
 		self.last_clock = -1.0
 		self.period = []
@@ -69,27 +133,126 @@ class Metrics:
 		self.njobs = []
 		self.median_njobs = -1.0
 		self.mean_njobs = -1.0
+		self.total_njobs = 0
 		self.changes = -1
 		self.bandwidth = []
+		self.bandwidth_durations = []
 		self.median_bandwidth = -1.0
 		self.mean_bandwidth = -1.0
 		self.max_bandwidth = -1.0
 		self.previous_bandwidth = -1.0
+		self.gaps = []
+		self.mean_gap = -1.0
+		self.max_gap = -1.0
+		self.median_period_error = 0.0
+		self.median_njobs_error = 0.0
+		self.median_bandwidth_error = 0.0
+		self.period_summary = None
+		self.njobs_summary = None
+		self.bandwidth_summary = None
+		self.gaps_summary = None
+		if summary_only:
+			self.period = None
+			self.njobs = None
+			self.bandwidth = None
+			self.bandwidth_durations = None
+			self.gaps = None
+			self.period_summary = QuantileSketch(sketch_size)
+			self.njobs_summary = QuantileSketch(sketch_size)
+			self.bandwidth_summary = QuantileSketch(sketch_size)
+			self.gaps_summary = QuantileSketch(sketch_size)
+
+	def copy(self, jobs):
+		"""
+		Returns a copy of these metrics before 
+		summarize_policy_metrics is called, that can be updated
+		without changing this object (used to resume 
+		simulations from a snapshot, see simulation_memo.py).
+		jobs is a dict relating each running Job to the Job 
+		that replaces it in the copied simulation.
+		"""
+		ret = copy(self)
+		if self.summary_only:
+			for name in ["period_summary", "njobs_summary", "bandwidth_summary", "gaps_summary"]:
+				setattr(ret, name, getattr(self, name).copy())
+			if hasattr(self, "last_decision"):
+				#the copied jobs keep their jobids
+				running = set([job.jobid for job in jobs])
+				ret.last_decision = {jobid : ion for jobid,ion in self.last_decision.items() if jobid in running}
+			return ret
+		for name in ["period", "njobs", "bandwidth", "bandwidth_durations", "gaps"]:
+			setattr(ret, name, list(getattr(self, name)))
+		if hasattr(self, "last_decision"):
+			#jobs that are no longer running will not be
+			#given to the policy again, so they are dropped
+			ret.last_decision = {jobs[job] : ion for job,ion in self.last_decision.items() if job in jobs}
+		return ret
 
 	def summarize_policy_metrics(self, clock):
 		if (self.last_clock >= 0) and (clock > self.last_clock):
 			#we have to register the last bandwidth we observed
-			self.bandwidth.extend([self.previous_bandwidth for i in range(int(self.last_clock), int(clock))])
+			self.register_bandwidth(clock)
 		self.makespan = clock
+		#no policy call will be registered after this, so the
+		#Bandwidth is no longer needed
+		self.bandwidth_getter = None
+		if self.summary_only:
+			self.summarize_sketches()
+			return
 		self.median_period = median(self.period)
 		self.mean_period = mean(self.period)
-		self.median_bandwidth = median(self.bandwidth)
-		self.mean_bandwidth = mean(self.bandwidth)
-		self.max_bandwidth = max(self.bandwidth)
+		values = numpy.array(self.bandwidth)
+		durations = numpy.array(self.bandwidth_durations)
+		self.median_bandwidth = weighted_median(values, durations)
+		self.mean_bandwidth = (values*durations).sum()/durations.sum()
+		self.max_bandwidth = values.max()
 		self.median_njobs = median(self.njobs)
 		self.mean_njobs = mean(self.njobs)
+		if len(self.gaps) > 0:
+			self.mean_gap = mean(self.gaps)
+			self.max_gap = max(self.gaps)
+
+	def summarize_sketches(self):
+		"""
+		Does what summarize_policy_metrics does, with 
+		summary_only.
+		"""
+		self.median_period, self.median_period_error = self.period_summary.median()
+		self.mean_period = self.period_summary.mean()
+		self.median_bandwidth, self.median_bandwidth_error = self.bandwidth_summary.median()
+		self.mean_bandwidth = self.bandwidth_summary.mean()
+		self.max_bandwidth = self.bandwidth_summary.maximum
+		self.median_njobs, self.median_njobs_error = self.njobs_summary.median()
+		self.mean_njobs = self.njobs_summary.mean()
+		if self.gaps_summary.count > 0:
+			self.mean_gap = self.gaps_summary.mean()
+			self.max_gap = self.gaps_summary.maximum
+		#the simulation is over, so no decision will be
+		#compared to the last one and the summaries are no
+		#longer needed
+		self.last_decision = None
+		self.period_summary = None
+		self.njobs_summary = None
+		self.bandwidth_summary = None
+		self.gaps_summary = None
 		
-	def register_policy_call(self, job_nb, clock, decision, debug=False):
+	def register_bandwidth(self, clock):
+		"""
+		Registers that the bandwidth was previous_bandwidth from
+		last_clock to clock.
+		"""
+		if self.exact_durations:
+			duration = clock - self.last_clock
+		else:
+			duration = int(clock) - int(self.last_clock)
+		if duration > 0:
+			if self.summary_only:
+				self.bandwidth_summary.add(self.previous_bandwidth, duration)
+			else:
+				self.bandwidth.append(self.previous_bandwidth)
+				self.bandwidth_durations.append(duration)
+
+	def register_policy_call(self, job_nb, clock, decision, debug=False, global_band=None, upper_bound=None):
 		"""
 		Parameters
 		----------
@@ -97,38 +260,79 @@ class Metrics:
 			the number of jobs
 		clock : float
 			current clock
+		global_band : float
+			the global bandwidth obtained with decision, if 
+			it is already known (for instance from a 
+			DecisionTable). Otherwise it is calculated here.
+		upper_bound : float
+			an upper bound on the global bandwidth of the 
+			best decision, given by approximate policies.
+			It is used to calculate the optimality gap of
+			the decision.
 		"""
 		self.policy_calls += 1
 		#calculate bandwidth
-		global_band = 0.0
-		for job in decision:
-			global_band += self.bandwidth_getter.get(job.app.app, job.app.nodes, job.app.procs, decision[job])
+		if global_band is None:
+			global_band = 0.0
+			for band in self.bandwidth_getter.get_many(list(decision), decision):
+				global_band += band
 		if debug:
 			print("The new global bandwidth is "+str(global_band))
+		if upper_bound is not None:
+			if self.summary_only:
+				self.gaps_summary.add((upper_bound - global_band)/upper_bound)
+			else:
+				self.gaps.append((upper_bound - global_band)/upper_bound)
 		#time between consecutive calls to the policy
 		if self.last_clock >= 0:
 			assert clock >= self.last_clock  
-			self.period.append(clock-self.last_clock)
+			if self.summary_only:
+				self.period_summary.add(clock-self.last_clock)
+			else:
+				self.period.append(clock-self.last_clock)
 			if debug:
 				print("Registering the previous bandwidth of "+str(self.previous_bandwidth)+" from times "+str(int(self.last_clock))+" to "+str(int(clock)))
-			self.bandwidth.extend([self.previous_bandwidth for i in range(int(self.last_clock), int(clock))])
+			self.register_bandwidth(clock)
 		self.last_clock = clock
 		self.previous_bandwidth = global_band
 		#number of jobs given as input
-		self.njobs.append(job_nb)
+		self.total_njobs += job_nb
+		if self.summary_only:
+			self.njobs_summary.add(job_nb)
+		else:
+			self.njobs.append(job_nb)
 		#number of calls where decisions changed for 
 		#applications that were running
 		#the last time we applied the policy
+		if self.summary_only:
+			#the Jobs themselves are not kept
+			current = {job.jobid : ion for job,ion in decision.items()}
+		else:
+			current = decision
 		if self.changes == -1:
 			self.changes = 0
 		else:
 			changed = False
-			for job in decision:
+			for job in current:
 				if job in self.last_decision:
-					if self.last_decision[job] != decision[job]:
+					if self.last_decision[job] != current[job]:
 						changed = True
 						break
 			if changed:
 				self.changes += 1
-		self.last_decision = decision
+		self.last_decision = current
 	
+
+#returns the median of values, where each value has the weight at the
+#same position of weights (numpy arrays). With integer weights, that is 
+#the same as the median of a list where each value is repeated as many
+#times as its weight.
+def weighted_median(values, weights):
+	order = numpy.argsort(values, kind="stable")
+	cumulative = numpy.cumsum(weights[order])
+	half = cumulative[-1]/2
+	#if half falls exactly between two values, the median is their
+	#mean, otherwise both indices are the same
+	low = order[numpy.searchsorted(cumulative, half, side="left")]
+	high = order[numpy.searchsorted(cumulative, half, side="right")]
+	return (values[low] + values[high])/2
@@ -1,3 +1,5 @@
+import os
+
 class OutputFile:
 	"""
 	Attributes
@@ -5,42 +7,72 @@ class OutputFile:
 	self.arq : file descriptor
 		the file that is opened at the constructor and used to 
 		output data.
-	self.buffer : str
+	self.buffer : List[str]
 		a buffer to keep things to be written to the file in 
-		order to avoid a large number of small writes
+		order to avoid a large number of small writes (joined
+		when written, instead of concatenating strings)
+	self.buffered : int
+		total length of the strings in the buffer
 	self.buf_size : int
 		maximum length of the buffer in number of chars. When
 		the buffer is full, it must be written to the file 
 		before proceeding.
 	"""
-	def __init__(self, filename, header="", buf=1*1024*1024):
+	def __init__(self, filename, header="", buf=1*1024*1024, append=False):
 		"""
 		Parameters
 		----------
 		filename : str
 			the name of the file to the created. If it 
-			exists, it will be overwritten.
+			exists, it will be overwritten (unless append
+			is True).
 		header : str
 			the first line of the file, which is usually a
 			header. A "\n" will be added to the end, so no
 			need to provide it.
 		buf : int
 			the maximum buffer size in number of chars.
+		append : boolean
+			if True, what is written is added to the end of
+			an existing file, and header is not written
 		"""
-		self.arq = open(filename, "w")
+		if append:
+			self.arq = open(filename, "a")
+		else:
+			self.arq = open(filename, "w")
 		self.buf_size = buf
-		self.buffer = ""
-		if len(header) > 0:
+		self.buffer = []
+		self.buffered = 0
+		if (len(header) > 0) and (not append):
 			self.write(header+"\n")
 
 	def write(self, msg):
-		if (len(msg) + len(self.buffer)) > self.buf_size:
-			self.arq.write(self.buffer+msg)
-			self.buffer = ""
-		else:
-			self.buffer += msg
-		
+		self.buffer.append(msg)
+		self.buffered += len(msg)
+		if self.buffered > self.buf_size:
+			self.arq.write("".join(self.buffer))
+			self.buffer = []
+			self.buffered = 0
+
+	def write_queue(self, queue):
+		"""
+		Writes the line of a Queue (see Queue.get_output_line).
+		It can be used as a sink (see pipeline.py).
+		"""
+		self.write(queue.get_output_line(queue.encode()))
+
+	def sync(self):
+		"""
+		Writes the buffer to the file and makes sure it reached
+		the disk. Returns the size of the file.
+		"""
+		self.arq.write("".join(self.buffer))
+		self.buffer = []
+		self.buffered = 0
+		self.arq.flush()
+		os.fsync(self.arq.fileno())
+		return self.arq.tell()
 
 	def close(self):
-		self.arq.write(self.buffer)
+		self.arq.write("".join(self.buffer))
 		self.arq.close()
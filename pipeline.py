@@ -0,0 +1,169 @@
+import queue
+import threading
+from itertools import islice
+from filters import passes_filters,order_filters
+from job_queue import Queue,compute_in_batch
+
+#The generation of queues as a chain of stages. Each stage is a
+#generator that takes the Queue objects of the previous one and yields
+#the ones it lets through, so nothing is computed before the last stage
+#asks for it, and closing the last stage (or breaking out of a loop
+#over it) stops the whole chain. The candidates (the first stage) come
+#from generate_serially or generate_in_parallel (generation.py). Those
+#of generate_serially are only generated, and they are simulated in
+#this process by the next stages: filter_stage computes what the 
+#filters need and simulation_stage the rest. With generate_in_parallel,
+#the worker processes generate, filter and simulate the candidates (the
+#other stages then find everything computed), and since it only keeps a
+#bounded number of tasks in flight, submitting new ones as the queues
+#are taken, the workers cannot get more than that ahead of the
+#consumer. In this process, each stage only runs when the next one
+#asks for a queue, so nothing runs ahead. generate (generate_queues.py)
+#is
+#
+#    simulation_stage(dedup_stage(filter_stage(candidates, ...), ...))
+#
+#The first N accepted queues are itertools.islice(stages, N), and
+#batch_filter_stage can replace filter_stage to simulate the queues in
+#batches, and sink_stage gives each queue to several sinks (output
+#files, lists...).
+#A stage can also run in another thread with buffered, connected to the
+#next one by a bounded queue (see buffered).
+
+#yields the queues that pass filters (see filters.py). The stages of
+#a Queue are computed lazily, so this is where the queues generated in
+#this process are simulated, and only as far as the filters need
+def filter_stage(queues, filters, instrumentation=None):
+    for new_queue in queues:
+        if passes_filters(new_queue, filters, instrumentation):
+            yield new_queue
+
+#the stages of Queue that are simulations
+SIMULATED_STAGES = ["baseline", "mckp"]
+
+#yields the same queues as filter_stage, but takes them batch_size at
+#a time and simulates the queues of each batch together (see
+#compute_in_batch in job_queue.py): the stages of the Queue are
+#computed in order, each one for the queues of the batch that passed
+#the filters of the previous ones, and the simulations no filter needs
+#are done at the end for the queues that passed all filters. Since the
+#queues are read ahead, if position (a dict) is given, it is updated by
+#the stage that makes them (as generate_serially does), so it is set 
+#back to what it was when each queue was read before that queue is 
+#yielded. A queue is only added to the Deduplicator given to
+#generate_serially (if any) by dedup_stage, after its batch was read,
+#so if it is generated again in the same batch, the copy is discarded
+#by dedup_stage instead of being replaced right away by another queue,
+#and the following queues are not the same as without batches (the 
+#workers have no Deduplicator, so this does not happen there)
+def batch_filter_stage(queues, filters, batch_size, instrumentation=None, position=None):
+    assert batch_size > 0
+    queues = iter(queues)
+    filters = order_filters(filters)
+    while True:
+        batch = []
+        positions = []
+        for new_queue in islice(queues, batch_size):
+            batch.append(new_queue)
+            if position is not None:
+                positions.append(dict(position))
+        if len(batch) == 0:
+            return
+        kept = list(range(len(batch)))
+        for stage in Queue.STAGES:
+            stage_filters = [queue_filter for queue_filter in filters if queue_filter.stage == stage]
+            if len(stage_filters) == 0:
+                continue
+            if stage in SIMULATED_STAGES:
+                compute_in_batch([batch[i] for i in kept], stage)
+            kept = [i for i in kept if passes_filters(batch[i], stage_filters, instrumentation)]
+        for stage in SIMULATED_STAGES:
+            compute_in_batch([batch[i] for i in kept], stage)
+        for i in kept:
+            if position is not None:
+                position.update(positions[i])
+            yield batch[i]
+
+#yields the queues that are not in deduplicator (see deduplicator.py),
+#and adds them to it
+def dedup_stage(queues, deduplicator, instrumentation=None):
+    for new_queue in queues:
+        q = new_queue.encode()
+        if deduplicator.contains(q):
+            if instrumentation is not None:
+                instrumentation.count("duplicates")
+            continue
+        deduplicator.add(q)
+        yield new_queue
+
+#yields the queues with all their metrics computed (see
+#Queue.compute_all), in this process
+def simulation_stage(queues):
+    for new_queue in queues:
+        new_queue.compute_all()
+        yield new_queue
+
+#gives each queue to every sink (a function that takes a Queue, for
+#instance the write_queue method of an OutputFile or the append method
+#of a list), in order, and then yields it
+def sink_stage(queues, sinks):
+    for new_queue in queues:
+        for sink in sinks:
+            sink(new_queue)
+        yield new_queue
+
+#marks the end of the items of a buffered stage
+END = object()
+
+#yields the items of stage (any iterable), which is iterated by another
+#thread. At most size items are kept between both threads: when the
+#buffer is full, the other thread waits, so it never runs more than
+#size items ahead. An exception raised by stage is raised here. When
+#this generator is closed (or garbage collected) before the end, the
+#other thread stops at the next item and closes stage, which closes
+#the stages before it (and shuts down their worker processes, if any).
+#This is only useful when the consumer and stage wait on different
+#things (disk, worker processes), since both threads share the
+#interpreter. Anything stage updates as it goes (for instance the
+#position given to generate) is ahead of the items already received
+def buffered(stage, size=16):
+    assert size > 0
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    #puts an item in items, unless stop is set while waiting.
+    #Returns False if it was stopped
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in stage:
+                if not put((item, None)):
+                    break
+            put((END, None))
+        except BaseException as error:
+            put((END, error))
+        finally:
+            if hasattr(stage, "close"):
+                stage.close()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()
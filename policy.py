@@ -1,14 +1,31 @@
 import numpy
 from bandwidth import Bandwidth 
 
-def apply_policy(job_list, node_nb, ion_nb, policy, metrics, clock, debug=False):
+#policy is "baseline", "mckp", "sparse_mckp" (see sparse_mckp_policy), or
+#"greedy_mckp" (see greedy_mckp_policy)
+#decision_table is an optional DecisionTable (see decision_table.py) with
+#the precomputed decisions of the mckp policy for this cluster. When
+#given, the mckp policy is not solved again, its answer is looked up.
+#incremental is an optional IncrementalMCKP (see incremental_mckp.py)
+#kept by the simulation, used to solve the "mckp" policy (it gives the
+#same decisions as mckp_policy)
+def apply_policy(job_list, node_nb, ion_nb, policy, metrics, clock, debug=False, decision_table=None, incremental=None):
+    global_band = None
+    upper_bound = None
     if policy == "baseline":
         decision = baseline_policy(job_list, node_nb, ion_nb)
-    elif policy == "mckp":
-        decision = mckp_policy(job_list, node_nb, ion_nb, metrics.bandwidth_getter)
+    elif (policy == "mckp") and (decision_table is None) and (incremental is not None):
+        decision = incremental.solve(job_list)
+    elif (policy == "greedy_mckp") and (decision_table is None):
+        decision, upper_bound = greedy_mckp_solution(job_list, ion_nb, metrics.bandwidth_getter)
+    elif policy in MCKP_POLICIES:
+        if decision_table is None:
+            decision = MCKP_POLICIES[policy](job_list, node_nb, ion_nb, metrics.bandwidth_getter)
+        else:
+            decision, global_band, upper_bound = decision_table.lookup(job_list)
     else:
         assert False
-    metrics.register_policy_call(len(job_list), clock, decision, debug)
+    metrics.register_policy_call(len(job_list), clock, decision, debug, global_band, upper_bound)
     return decision
     
 #the baseline policy has a fixed number of computing nodes assigned to 
@@ -23,42 +40,37 @@ def baseline_policy(job_list, node_nb, ion_nb):
         assert decisions[job] > 0
     return decisions
 
+#the numbers of I/O nodes that can be given to a job by mckp_policy
+#(see sparse_mckp_policy for options taken from the catalog)
+MCKP_FORWARDERS = [1, 2, 4, 8]
+
+#returns (values, weight) of a job for mckp_policy: its bandwidth with
+#each number of I/O nodes in MCKP_FORWARDERS, and these numbers
+def mckp_job_options(job, bandwidth_getter):
+    # Since we need to use integers and we are 
+    #using five precision points, convert it
+    values = (bandwidth_getter.get_vector(job.app, MCKP_FORWARDERS)* 100000.0).astype(int).tolist()
+    return values, list(MCKP_FORWARDERS)
+
 #copied and adapted the MCKP policy from the code written by Jean Bez
-def mckp_policy(job_list, node_nb, ion_nb, bandwidth_getter):
-    # TODO: make this more dynamic
-    avaible_forwarders = [1, 2, 4, 8]
+#if vectorized is True, each group's layer of the dynamic program is
+#filled with whole-array numpy operations over the capacity axis
+#instead of element by element. Both ways give the same decisions.
+def mckp_policy(job_list, node_nb, ion_nb, bandwidth_getter, vectorized=True):
     values = {}
     weight = {}
-    groups = {}
     for group_id,job in enumerate(job_list):
-        values[group_id] = []
-        weight[group_id] = []
-        groups[group_id] = []
-        for nodes in avaible_forwarders:
-            # Since we need to use integers and we are 
-            #using five precision points, convert it
-            values[group_id].append(int(bandwidth_getter.get(job.app.app, job.app.nodes, job.app.procs, nodes)* 100000.0))
-            weight[group_id].append(nodes)
-    table = numpy.zeros((len(job_list), ion_nb + 1), dtype=int)
-    solution_table = numpy.zeros((len(job_list), len(avaible_forwarders), ion_nb + 1),dtype=int)
-    for i in range(0, len(avaible_forwarders)):
-        if weight[0][i] <= ion_nb:
-            table[0][weight[0][i]] = max(table[0][weight[0][i]], values[0][i])
-            solution_table[0][i][0] = table[0][weight[0][i]]
-    for j in range(0, len(avaible_forwarders)):
-        for k in range(0, ion_nb + 1):
-            if k > 0:
-                solution_table[0][j][k] = solution_table[0][j][0]
-    for i in range(1, len(job_list)):
-        for j in range(0, len(avaible_forwarders)):
-            for k in range(0, ion_nb + 1):
-                if k < weight[i][j]:
-                    solution_table[i][j][k] = solution_table[i][j - 1][k]
-                elif table[i - 1][k - weight[i][j]] > 0:
-                    table[i][k] = max(table[i][k], table[i - 1][k - weight[i][j]] + values[i][j])
-                    solution_table[i][j][k] = table[i][k]
-                else:
-                    solution_table[i][j][k] = table[i][k]
+        values[group_id], weight[group_id] = mckp_job_options(job, bandwidth_getter)
+    if vectorized:
+        table, solution_table = fill_mckp_tables_vectorized(values, weight, len(job_list), ion_nb)
+    else:
+        table, solution_table = fill_mckp_tables(values, weight, len(job_list), ion_nb)
+    return mckp_backtrack(job_list, values, weight, solution_table, ion_nb)
+
+#finds the decision of mckp_policy from the filled solution_table. 
+#values and weight are indexed by the position of the job in job_list
+def mckp_backtrack(job_list, values, weight, solution_table, ion_nb):
+    avaible_forwarders = MCKP_FORWARDERS
     index_max = 0
     index_max_solution = 0
     for i in range(0, ion_nb + 1):
@@ -96,3 +108,242 @@ def mckp_policy(job_list, node_nb, ion_nb, bandwidth_getter):
         # Remember to convert the value back to the floating point
         #expected_bandwith[job] = allocated_bandwidth[i] / 100000.0
     return selected_nodes
+
+#fills the dynamic programming tables of the MCKP policy one element at
+#a time. values and weight have, for each of the group_nb groups (jobs),
+#the list of values (bandwidth) and weights (number of I/O nodes) of 
+#each option. Returns (table, solution_table)
+def fill_mckp_tables(values, weight, group_nb, ion_nb):
+    option_nb = len(weight[0])
+    table = numpy.zeros((group_nb, ion_nb + 1), dtype=int)
+    solution_table = numpy.zeros((group_nb, option_nb, ion_nb + 1),dtype=int)
+    for i in range(0, option_nb):
+        if weight[0][i] <= ion_nb:
+            table[0][weight[0][i]] = max(table[0][weight[0][i]], values[0][i])
+            solution_table[0][i][0] = table[0][weight[0][i]]
+    for j in range(0, option_nb):
+        for k in range(0, ion_nb + 1):
+            if k > 0:
+                solution_table[0][j][k] = solution_table[0][j][0]
+    for i in range(1, group_nb):
+        for j in range(0, option_nb):
+            for k in range(0, ion_nb + 1):
+                if k < weight[i][j]:
+                    solution_table[i][j][k] = solution_table[i][j - 1][k]
+                elif table[i - 1][k - weight[i][j]] > 0:
+                    table[i][k] = max(table[i][k], table[i - 1][k - weight[i][j]] + values[i][j])
+                    solution_table[i][j][k] = table[i][k]
+                else:
+                    solution_table[i][j][k] = table[i][k]
+    return table, solution_table
+
+#fills the same tables as fill_mckp_tables, but each (group, option)
+#pair is computed at once for all capacities with numpy operations
+def fill_mckp_tables_vectorized(values, weight, group_nb, ion_nb):
+    rows = []
+    solutions = []
+    for i in range(0, group_nb):
+        if i == 0:
+            row, layer = fill_first_mckp_layer(values[0], weight[0], ion_nb)
+        else:
+            row, layer = fill_mckp_layer(rows[i - 1], values[i], weight[i], ion_nb)
+        rows.append(row)
+        solutions.append(layer)
+    return numpy.array(rows), numpy.array(solutions)
+
+#returns the row of the table and the layer of the solution table (see
+#fill_mckp_tables) of the first group, with the values and weight of
+#its options
+def fill_first_mckp_layer(values, weight, ion_nb):
+    option_nb = len(weight)
+    row = numpy.zeros(ion_nb + 1, dtype=int)
+    solutions = numpy.zeros((option_nb, ion_nb + 1),dtype=int)
+    for i in range(0, option_nb):
+        if weight[i] <= ion_nb:
+            row[weight[i]] = max(row[weight[i]], values[i])
+            solutions[i][:] = row[weight[i]]
+    return row, solutions
+
+#returns the row of the table and the layer of the solution table of
+#a group after the first one, given the row of the previous group. The
+#layers of a group only depend on the groups before it, so they can be
+#kept while these groups do not change (see IncrementalMCKP)
+def fill_mckp_layer(previous_row, values, weight, ion_nb):
+    option_nb = len(weight)
+    row = numpy.zeros(ion_nb + 1, dtype=int)
+    solutions = numpy.zeros((option_nb, ion_nb + 1),dtype=int)
+    for j in range(0, option_nb):
+        w = weight[j]
+        #capacities smaller than the weight keep the solution
+        #of the previous option (for j = 0 that is the still
+        #empty last option, as in fill_mckp_tables)
+        solutions[j][:w] = solutions[j - 1][:w]
+        if w > ion_nb:
+            continue
+        previous = previous_row[:ion_nb + 1 - w]
+        row[w:] = numpy.where(previous > 0, numpy.maximum(row[w:], previous + values[j]), row[w:])
+        solutions[j][w:] = row[w:]
+    return row, solutions
+
+#solves the same problem as mckp_policy (give each job a number of I/O
+#nodes so the sum of their bandwidths is maximal, using at most ion_nb
+#I/O nodes) exactly, without its limitations:
+#- the options of each job are all numbers of I/O nodes (at least 1)
+#  for which the catalog has both the bandwidth and the runtime of its
+#  application (see Bandwidth.get_options), instead of 1, 2, 4 and 8
+#- only the reachable numbers of used I/O nodes are kept, and among
+#  them only the ones that give more bandwidth than all smaller ones
+#  (the others can never be part of a better solution), so the work
+#  and memory do not grow with ion_nb x job number x options
+#- bandwidths are compared as floats, not scaled to integers
+#The jobs are solved in the order of their applications, so the
+#decisions depend only on the set of applications (and on the position
+#of jobs running the same application), as DecisionTable expects.
+#Among solutions with the same bandwidth, the one using fewer I/O nodes
+#is chosen.
+def sparse_mckp_policy(job_list, node_nb, ion_nb, bandwidth_getter):
+    order = sorted(range(len(job_list)), key=lambda position: (job_list[position].app.app, job_list[position].app.nodes, job_list[position].app.procs))
+    options = [bandwidth_getter.get_options(job_list[position].app) for position in order]
+    #the minimum number of I/O nodes needed by the jobs after each one
+    still_needed = [0]*len(options)
+    for group in range(len(options) - 2, -1, -1):
+        still_needed[group] = still_needed[group + 1] + options[group + 1][0][0]
+    #the states after each group: used I/O nodes and the best total
+    #bandwidth obtained with them, and for backtracking, the previous
+    #state and the chosen option of each state
+    used = numpy.zeros(1, dtype=int)
+    total = numpy.zeros(1)
+    steps = []
+    for group, (forwarders, bandwidths) in enumerate(options):
+        new_used = (used[:, None] + forwarders[None, :]).ravel()
+        new_total = (total[:, None] + bandwidths[None, :]).ravel()
+        parents = numpy.repeat(numpy.arange(len(used)), len(forwarders))
+        choices = numpy.tile(numpy.arange(len(forwarders)), len(used))
+        feasible = new_used <= ion_nb - still_needed[group]
+        new_used = new_used[feasible]
+        new_total = new_total[feasible]
+        parents = parents[feasible]
+        choices = choices[feasible]
+        #keep only the states with more bandwidth than every
+        #state using fewer (or as many) I/O nodes
+        ordered = numpy.lexsort((-new_total, new_used))
+        new_used = new_used[ordered]
+        new_total = new_total[ordered]
+        best_before = numpy.concatenate(([-numpy.inf], numpy.maximum.accumulate(new_total)[:-1]))
+        kept = ordered[new_total > best_before]
+        used = new_used[new_total > best_before]
+        total = new_total[new_total > best_before]
+        steps.append((parents[kept], choices[kept]))
+    assert len(used) > 0, "not enough I/O nodes for "+str(len(job_list))+" jobs"
+    #the last state has the most bandwidth
+    state = len(used) - 1
+    decision = {}
+    for group in range(len(options) - 1, -1, -1):
+        parents, choices = steps[group]
+        decision[job_list[order[group]]] = int(options[group][0][choices[state]])
+        state = parents[state]
+    return {job : decision[job] for job in job_list}
+
+#returns the indices of the options (numbers of I/O nodes in increasing
+#order, and the bandwidth with each) on the upper convex hull that
+#starts at the first option. The other options are never chosen by the
+#linear relaxation of the MCKP.
+def hull_options(forwarders, bandwidths):
+    hull = [0]
+    for option in range(1, len(forwarders)):
+        if bandwidths[option] <= bandwidths[hull[-1]]:
+            continue #gives less bandwidth with more I/O nodes
+        #remove the points below the segment to the new one
+        while len(hull) >= 2:
+            first, second = hull[-2], hull[-1]
+            if (bandwidths[second] - bandwidths[first])*(forwarders[option] - forwarders[first]) <= (bandwidths[option] - bandwidths[first])*(forwarders[second] - forwarders[first]):
+                hull.pop()
+            else:
+                break
+        hull.append(option)
+    return hull
+
+#returns the option (index in forwarders and bandwidths, see
+#Bandwidth.get_options) that gives the most bandwidth using at most
+#available I/O nodes more than the option current (current if none is
+#better)
+def best_option_within(forwarders, bandwidths, current, available):
+    best = current
+    for option in range(len(forwarders)):
+        if (forwarders[option] <= forwarders[current] + available) and (bandwidths[option] > bandwidths[best]):
+            best = option
+    return best
+
+#approximate solution of the MCKP (see sparse_mckp_policy), in time
+#O(n log n) for n options. Every job starts with its smallest number
+#of I/O nodes, and then the increments along the convex hull of the
+#options of each job (see hull_options) are given in order of 
+#bandwidth gained per I/O node, while they fit. That is the solution of
+#the linear relaxation of the problem up to the first increment that
+#does not fit, so the relaxation also gives an upper bound on the
+#bandwidth of the best decision. When an increment does not fit, the
+#job gets instead the best option that fits in the I/O nodes that are
+#left, and the smaller increments of the other jobs are still given if
+#they fit. At the end, the I/O nodes that are left are used to improve
+#each job. Returns (decision, upper_bound).
+def greedy_mckp_solution(job_list, ion_nb, bandwidth_getter):
+    #solved in the order of the applications, as sparse_mckp_policy
+    order = sorted(range(len(job_list)), key=lambda position: (job_list[position].app.app, job_list[position].app.nodes, job_list[position].app.procs))
+    options = []
+    current = [] #the chosen option of each job
+    on_hull = [] #the position of that option on the hull, -1 if
+            #it is not on the hull
+    value = 0.0
+    remaining = ion_nb
+    increments = [] #(-efficiency, group, position on the hull)
+    for group, position in enumerate(order):
+        forwarders, bandwidths = bandwidth_getter.get_options(job_list[position].app)
+        hull = hull_options(forwarders, bandwidths)
+        options.append((forwarders, bandwidths, hull))
+        current.append(hull[0])
+        on_hull.append(0)
+        value += bandwidths[hull[0]]
+        remaining -= forwarders[hull[0]]
+        for step in range(1, len(hull)):
+            increments.append((-(bandwidths[hull[step]] - bandwidths[hull[step-1]])/(forwarders[hull[step]] - forwarders[hull[step-1]]), group, step))
+    assert remaining >= 0, "not enough I/O nodes for "+str(len(job_list))+" jobs"
+    increments.sort()
+    upper_bound = None
+    for efficiency, group, step in increments:
+        if on_hull[group] != step - 1:
+            continue #this job left the hull
+        forwarders, bandwidths, hull = options[group]
+        weight = forwarders[hull[step]] - forwarders[hull[step-1]]
+        gain = bandwidths[hull[step]] - bandwidths[hull[step-1]]
+        if weight <= remaining:
+            current[group] = hull[step]
+            on_hull[group] = step
+            remaining -= weight
+            value += gain
+            continue
+        if upper_bound is None:
+            #the linear relaxation takes a fraction of it
+            upper_bound = value + gain*remaining/weight
+        best = best_option_within(forwarders, bandwidths, current[group], remaining)
+        remaining -= forwarders[best] - forwarders[current[group]]
+        value += bandwidths[best] - bandwidths[current[group]]
+        current[group] = best
+        on_hull[group] = -1
+    if upper_bound is None:
+        upper_bound = value #all increments fit
+    decision = {}
+    for group, position in enumerate(order):
+        forwarders, bandwidths, hull = options[group]
+        best = best_option_within(forwarders, bandwidths, current[group], remaining)
+        remaining -= forwarders[best] - forwarders[current[group]]
+        decision[job_list[position]] = int(forwarders[best])
+    return {job : decision[job] for job in job_list}, upper_bound
+
+#the decision of greedy_mckp_solution
+def greedy_mckp_policy(job_list, node_nb, ion_nb, bandwidth_getter):
+    return greedy_mckp_solution(job_list, ion_nb, bandwidth_getter)[0]
+
+#the solvers of the MCKP policy, by policy name
+MCKP_POLICIES = {"mckp" : mckp_policy,
+    "sparse_mckp" : sparse_mckp_policy,
+    "greedy_mckp" : greedy_mckp_policy}
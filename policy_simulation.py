@@ -1,24 +1,43 @@
+from heapq import heappop,heappush,heapify
 from job import Job
 from metrics import Metrics
 from policy import apply_policy
+from incremental_mckp import IncrementalMCKP
+from application_encode import encode_queue
 
-#this is similar to play_execution from queue.py in the sense that we 
+#this is similar to calculate_makespan from job_queue.py in the sense that we 
 #try to play what will happen during the execution to collect metrics.
 #However, here we take into consideration the number of I/O  nodes 
 #given to each job and try to estimate I/O bandwidth.
 #we will play the execution of a exp_queue of jobs on a cluster of node_nb
 #processing nodes and ion_nb I/O nodes
+#decision_table is an optional DecisionTable, see apply_policy
+#exact_durations tells how the Metrics weight the bandwidth and 
+#summary_only if they keep only summaries (see Metrics)
+#memo is an optional SimulationMemo: the simulation starts from the 
+#snapshot of the longest prefix of exp_queue it has, and snapshots of 
+#this simulation are added to it (see simulation_memo.py)
 #returns a Metrics object with all the calculated metrics
-def simulate_execution_with_policy(exp_queue, node_nb, ion_nb, policy, bandwidth_getter, debug=False):
-	clock = 0
+def simulate_execution_with_policy(exp_queue, node_nb, ion_nb, policy, bandwidth_getter, debug=False, decision_table=None, exact_durations=False, memo=None, summary_only=False):
+	scheduled = 0 #how many applications of exp_queue were scheduled
+	snapshot = None
+	if memo is not None:
+		parameters = ("simulation", node_nb, ion_nb, policy, exact_durations, summary_only)
+		encoded = encode_queue(exp_queue)
+		scheduled, snapshot = memo.longest_prefix(parameters, encoded)
+	if snapshot is None:
+		clock = 0
+		available_nodes = node_nb
+		running = [] #it will keep the jobs while they are running
+		jobid = 0
+		metrics = Metrics(bandwidth_getter, exact_durations, summary_only)
+	else:
+		clock, available_nodes, running, jobid, metrics = copy_simulation_state(*snapshot)
 	#makes a hard copy of exp_queue (below), otherwise python would
 	#copy the reference to the list, and it would be modified in
 	#this function (which we do not want to happen)
-	queue = [job for job in exp_queue]  
-	available_nodes = node_nb
-	running = [] #it will keep the jobs while they are running
-	jobid = 0
-	metrics = Metrics(bandwidth_getter)
+	queue = exp_queue[scheduled:]
+	incremental = make_incremental_solver(ion_nb, policy, bandwidth_getter, decision_table)
 	if debug:
 		print("Will start the simulation with "+str(node_nb)+" computing nodes, "+str(ion_nb)+" I/O nodes, and queue: "+str([str(app) for app in queue]))
 	while(len(queue) > 0) or (len(running) > 0): #while there are 
@@ -32,10 +51,15 @@ def simulate_execution_with_policy(exp_queue, node_nb, ion_nb, policy, bandwidth
 			if debug:
 				print("Scheduled "+str(queue[0]) +", available = "+str(available_nodes)) 
 			del queue[0]
+			scheduled += 1
+			#there is nothing to gain from a snapshot
+			#before the policy is applied for the first time
+			if (memo is not None) and (metrics.policy_calls > 0) and (scheduled % memo.stride == 0):
+				memo.store(parameters, encoded[:scheduled], lambda: copy_simulation_state(clock, available_nodes, running, jobid, metrics))
 		#now we know the set of jobs that will run concurrently
 		#until the next event, so we have to decide the number 
 		#of I/O nodes to each of them
-		decisions = apply_policy(running, node_nb, ion_nb, policy, metrics, clock, debug) 
+		decisions = apply_policy(running, node_nb, ion_nb, policy, metrics, clock, debug, decision_table, incremental)
 		for job in running:
 			job.update_io_nodes(decisions[job], clock)
 		if debug:
@@ -64,6 +88,24 @@ def simulate_execution_with_policy(exp_queue, node_nb, ion_nb, policy, bandwidth
 	metrics.summarize_policy_metrics(clock)
 	return metrics
 
+#returns a copy of the state of a simulation (see 
+#simulate_execution_with_policy), to be kept as a snapshot or to 
+#resume from one: the clock, the number of available nodes, the 
+#running jobs, the next jobid and the Metrics. The jobs and the Metrics
+#are copied, so they can be changed without changing the original ones
+def copy_simulation_state(clock, available_nodes, running, jobid, metrics):
+	jobs = {job : job.copy() for job in running}
+	return clock, available_nodes, [jobs[job] for job in running], jobid, metrics.copy(jobs)
+
+#returns the IncrementalMCKP used to solve the mckp policy during a
+#simulation (the running jobs change little between calls, so the 
+#layers of the dynamic program are kept), or None if the policy is not
+#solved at every call
+def make_incremental_solver(ion_nb, policy, bandwidth_getter, decision_table):
+	if (policy == "mckp") and (decision_table is None):
+		return IncrementalMCKP(ion_nb, bandwidth_getter)
+	return None
+
 #gets a list of jobs, estimate all their ending times, returns a list
 #of the next ones to end (we could have multiple jobs ending at the 
 #same time) AND the time that is going to happen.
@@ -86,3 +128,90 @@ def get_next_finishing_jobs(job_list, clock, debug=False):
 	return (next_jobs,next_end)
 		
 		
+
+#does the same as simulate_execution_with_policy, but instead of 
+#looking for the jobs that end first among all running jobs, it keeps a
+#heap of their projected end times. Only the jobs whose number of I/O
+#nodes changed (or that were just scheduled) are touched after the
+#policy is applied: their progress is updated, and they get a new entry
+#in the heap, with their new end time. The entries of the other jobs
+#are still valid, since they advance at the same pace, so their progress
+#is only updated when their number of I/O nodes changes. The old entry
+#of a job is not removed from the heap, it is skipped when it gets to
+#the top (the heap is rebuilt when most of it is outdated). Jobs that
+#end at the same time are finished in the order they were scheduled, as
+#in simulate_execution_with_policy.
+#The progress of a job is summed in fewer steps, so its end time may
+#differ from the one of simulate_execution_with_policy in the last
+#digits. Hence the metrics are only the same up to rounding (see
+#tests/test_policy_simulation.py), and two jobs that end at the same
+#time in one engine may end a few ulps apart in the other (which adds a
+#policy call).
+#returns a Metrics object with all the calculated metrics
+def simulate_execution_lazily(exp_queue, node_nb, ion_nb, policy, bandwidth_getter, debug=False, decision_table=None, exact_durations=False, summary_only=False):
+	clock = 0
+	next_app = 0 #position in exp_queue of the next application to be
+			#scheduled
+	available_nodes = node_nb
+	running = {} #relates the jobs while they are running, in the 
+			#order they were scheduled, to the stamp of their
+			#current entry in events
+	events = [] #a heap of (end time, jobid, stamp, job)
+	stamp = 0
+	jobid = 0
+	metrics = Metrics(bandwidth_getter, exact_durations, summary_only)
+	incremental = make_incremental_solver(ion_nb, policy, bandwidth_getter, decision_table)
+	if debug:
+		print("Will start the simulation with "+str(node_nb)+" computing nodes, "+str(ion_nb)+" I/O nodes, and queue: "+str([str(app) for app in exp_queue]))
+	while (next_app < len(exp_queue)) or (len(running) > 0):
+		#first we try to schedule jobs
+		while (next_app < len(exp_queue)) and (exp_queue[next_app].nodes <= available_nodes):
+			running[Job(jobid,clock,exp_queue[next_app])] = None
+			jobid+=1
+			available_nodes -= exp_queue[next_app].nodes
+			if debug:
+				print("Scheduled "+str(exp_queue[next_app]) +", available = "+str(available_nodes)) 
+			next_app += 1
+		#decide the number of I/O nodes, and project the end time
+		#of the jobs whose number of I/O nodes changed
+		job_list = list(running)
+		decisions = apply_policy(job_list, node_nb, ion_nb, policy, metrics, clock, debug, decision_table, incremental)
+		for job in job_list:
+			if decisions[job] != job.ion:
+				job.update_io_nodes(decisions[job], clock)
+				stamp += 1
+				running[job] = stamp
+				heappush(events, (job.estimate_end_time(), job.jobid, stamp, job))
+		if len(events) > 2*len(running):
+			events = [event for event in events if running.get(event[3]) == event[2]]
+			heapify(events)
+		if debug:
+			print("Made new decisions about the number of I/O nodes:")
+			for job in decisions:
+				print(str(job.app)+"\t"+str(decisions[job]))
+		#go to the moment the first job ends (multiple jobs may
+		#end at the same time)
+		done = []
+		while len(events) > 0:
+			end_time,_,entry_stamp,job = events[0]
+			if running.get(job) != entry_stamp:
+				#outdated, or the job already ended
+				heappop(events)
+				continue
+			if (len(done) > 0) and (end_time != new_clock):
+				break
+			heappop(events)
+			new_clock = end_time
+			done.append(job)
+		if new_clock <= clock:
+			print("WARNING! The simulation is going from "+str(clock)+" to "+str(new_clock))
+		clock = new_clock
+		for job in done:
+			del running[job]
+			available_nodes += job.app.nodes
+			if debug:
+				print("End of job "+str(job.app)+", available nodes = "+str(available_nodes))
+		if debug:
+			print("---------------------------------------------------")
+	metrics.summarize_policy_metrics(clock)
+	return metrics
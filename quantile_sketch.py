@@ -0,0 +1,191 @@
+class QuantileSketch:
+	"""
+	A summary of a stream of weighted values that gives their count,
+	mean, minimum, maximum and (weighted) median without keeping
+	the values (used by Metrics with summary_only=True).
+
+	The values are kept as centroids: disjoint intervals [low, high]
+	of values, sorted, with the total weight of the values that fell
+	in each of them. New values are first
+	added to a buffer, and the buffer is merged into the centroids
+	every size values (a value that falls inside a centroid is added
+	to it, otherwise it makes a new centroid). While there are at
+	most 2*size distinct values, each centroid has a single value
+	and the median is exact. Above that, adjacent centroids are
+	merged, from the lowest to the highest, as long as their weight
+	stays under total/size, which keeps at most about 2*size
+	centroids.
+
+	Since the centroids are disjoint and their weights are exact,
+	the weighted median is known to be in the interval of the
+	centroid where the cumulative weight reaches half of the total.
+	It is estimated by interpolating inside that interval, and the
+	largest distance from the estimate to the ends of the interval
+	is a bound on the error (0 when the median is exact). The median
+	is defined as in weighted_median (metrics.py): with integer
+	weights, the median of the list where each value is repeated as
+	many times as its weight.
+
+	...
+
+	Attributes
+	----------
+	size : int
+		how many values are buffered, and how many centroids
+		are kept after merging (up to about twice as many)
+	lows and highs : List[float]
+		the intervals of the centroids, sorted
+	weights : List[float]
+		the total weight of each centroid
+	buffer : List[(float, float)]
+		values and weights not merged into the centroids yet
+	count : int
+		how many values were added
+	total : float
+		the sum of the weights
+	weighted_sum : float
+		the sum of the values multiplied by their weights
+	minimum and maximum : float
+		the smallest and the largest value (None if there are
+		no values)
+
+	Methods
+	-------
+	add(value, weight=1)
+		adds a value
+	flush()
+		merges the buffered values into the centroids
+	mean()
+		returns the weighted mean of the values
+	median()
+		returns the weighted median and a bound on its error
+	copy()
+		returns a copy of this sketch
+	"""
+	def __init__(self, size=100):
+		assert size > 0
+		self.size = size
+		self.lows = []
+		self.highs = []
+		self.weights = []
+		self.buffer = []
+		self.count = 0
+		self.total = 0
+		self.weighted_sum = 0
+		self.minimum = None
+		self.maximum = None
+
+	def add(self, value, weight=1):
+		assert weight > 0
+		self.count += 1
+		self.total += weight
+		self.weighted_sum += value*weight
+		if (self.minimum is None) or (value < self.minimum):
+			self.minimum = value
+		if (self.maximum is None) or (value > self.maximum):
+			self.maximum = value
+		self.buffer.append((value, weight))
+		if len(self.buffer) >= self.size:
+			self.flush()
+
+	def flush(self):
+		"""
+		Merges the buffer into the centroids, and merges the
+		centroids if there are more than 2*size of them.
+		"""
+		if len(self.buffer) == 0:
+			return
+		self.buffer.sort()
+		lows = []
+		highs = []
+		weights = []
+		i = 0
+		for value, weight in self.buffer:
+			#the centroids below value come first
+			while (i < len(self.lows)) and (self.highs[i] < value):
+				lows.append(self.lows[i])
+				highs.append(self.highs[i])
+				weights.append(self.weights[i])
+				i += 1
+			if (i < len(self.lows)) and (self.lows[i] <= value):
+				self.weights[i] += weight
+			elif (len(highs) > 0) and (highs[-1] == value):
+				#the same value was already in the buffer
+				weights[-1] += weight
+			else:
+				lows.append(value)
+				highs.append(value)
+				weights.append(weight)
+		self.lows = lows + self.lows[i:]
+		self.highs = highs + self.highs[i:]
+		self.weights = weights + self.weights[i:]
+		self.buffer = []
+		if len(self.lows) > 2*self.size:
+			self.compress()
+
+	def compress(self):
+		"""
+		Merges adjacent centroids while their weight stays under
+		total/size.
+		"""
+		limit = self.total/self.size
+		lows = [self.lows[0]]
+		highs = [self.highs[0]]
+		weights = [self.weights[0]]
+		for i in range(1, len(self.lows)):
+			if weights[-1] + self.weights[i] <= limit:
+				highs[-1] = self.highs[i]
+				weights[-1] += self.weights[i]
+			else:
+				lows.append(self.lows[i])
+				highs.append(self.highs[i])
+				weights.append(self.weights[i])
+		self.lows = lows
+		self.highs = highs
+		self.weights = weights
+
+	def mean(self):
+		if self.total == 0:
+			return float("nan")
+		return self.weighted_sum/self.total
+
+	def median(self):
+		"""
+		Returns (estimate, error): the exact median is between
+		estimate - error and estimate + error. Both are nan if
+		there are no values.
+		"""
+		self.flush()
+		if self.total == 0:
+			return float("nan"), float("nan")
+		half = self.total/2
+		cumulative = 0
+		for k in range(len(self.weights)):
+			previous = cumulative
+			cumulative += self.weights[k]
+			if cumulative >= half:
+				break
+		if cumulative == half:
+			#half falls between two centroids, so the median is
+			#the mean of the highest value of one and the lowest
+			#of the next (which are exact)
+			return (self.highs[k] + self.lows[k+1])/2, 0.0
+		low = self.lows[k]
+		high = self.highs[k]
+		if low == high:
+			return float(low), 0.0
+		estimate = low + (high - low)*(half - previous)/self.weights[k]
+		return estimate, max(estimate - low, high - estimate)
+
+	def copy(self):
+		ret = QuantileSketch(self.size)
+		ret.lows = list(self.lows)
+		ret.highs = list(self.highs)
+		ret.weights = list(self.weights)
+		ret.buffer = list(self.buffer)
+		ret.count = self.count
+		ret.total = self.total
+		ret.weighted_sum = self.weighted_sum
+		ret.minimum = self.minimum
+		ret.maximum = self.maximum
+		return ret
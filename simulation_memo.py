@@ -0,0 +1,150 @@
+from collections import OrderedDict
+
+class SimulationMemo:
+	"""
+	Snapshots of simulations (see simulate_execution_with_policy in
+	policy_simulation.py), keyed by the prefix of the queue that 
+	was simulated, so the simulation of a queue that starts with the
+	same applications as a queue simulated before can start from
+	the snapshot instead of from the beginning.
+
+	With FIFO, nothing that happens before the k-th application of
+	the queue is scheduled depends on the applications after it.
+	So the state of a simulation right after it schedules the k-th
+	application (the clock, the running jobs with their progress,
+	and the Metrics so far) is the same for all queues with the same
+	k first applications. A snapshot is taken every stride
+	applications; a new simulation looks for the longest prefix of
+	its queue that has one, and continues from there. The results
+	are exactly the same as simulating the whole queue.
+
+	Most prefixes of random queues are never seen again, so a
+	snapshot is only taken the second time a prefix is simulated
+	(the first time, the prefix is only remembered). At most
+	capacity snapshots (and capacity remembered prefixes) are kept:
+	when there are too many, the one that was used the least
+	recently is discarded (LRU). Snapshots are only comparable for the same parameters, so the
+	key of a snapshot also has the kind of simulation and its
+	parameters (see key).
+
+	Jobs that start together at the beginning of the simulation are
+	scheduled before any event, so only prefixes long enough to
+	cover the first events save time. That requires queues with
+	few distinct applications (with the 9 applications of 
+	runtime.csv, random queues rarely share more than the first 3
+	or 4 applications, and the snapshots cost more than they save).
+
+	...
+
+	Attributes
+	----------
+	capacity : int
+		maximum number of snapshots
+	stride : int
+		a snapshot is taken after every stride applications
+	snapshots : OrderedDict {tuple, object}
+		the snapshots, from the least to the most recently used
+	seen : OrderedDict {tuple, None}
+		the keys of the prefixes that were simulated once but
+		have no snapshot yet, from the least to the most 
+		recently seen
+	hits : int
+		how many simulations started from a snapshot
+	misses : int
+		how many simulations started from the beginning
+	skipped_apps : int
+		how many applications were already scheduled in the
+		snapshots the simulations started from
+	evictions : int
+		how many snapshots were discarded
+
+	Methods
+	-------
+	key(parameters, prefix)
+		returns the key of a snapshot
+	longest_prefix(parameters, encoded)
+		returns the snapshot of the longest prefix of a queue
+	store(parameters, prefix, make_snapshot)
+		keeps a snapshot
+	record(instrumentation)
+		adds the counters to an Instrumentation
+	"""
+	def __init__(self, capacity=100000, stride=1):
+		assert (capacity > 0) and (stride > 0)
+		self.capacity = capacity
+		self.stride = stride
+		self.snapshots = OrderedDict()
+		self.seen = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+		self.skipped_apps = 0
+		self.evictions = 0
+
+	def key(self, parameters, prefix):
+		"""
+		parameters is a tuple with the kind of simulation and
+		everything its results depend on, besides the queue,
+		and prefix is the encoding of the applications that
+		were scheduled (see encode_application).
+		"""
+		return parameters + (prefix,)
+
+	def longest_prefix(self, parameters, encoded):
+		"""
+		Returns (length, snapshot) for the longest prefix of
+		the queue encoded (see encode_queue) with a snapshot,
+		or (0, None) if there is none. The whole queue is not
+		taken as a prefix, so the simulation always has
+		something to schedule.
+		"""
+		length = ((len(encoded)-1)//self.stride)*self.stride
+		while length > 0:
+			key = self.key(parameters, encoded[:length])
+			if key in self.snapshots:
+				self.snapshots.move_to_end(key)
+				self.hits += 1
+				self.skipped_apps += length
+				return length, self.snapshots[key]
+			length -= self.stride
+		self.misses += 1
+		return 0, None
+
+	def store(self, parameters, prefix, make_snapshot):
+		"""
+		Keeps a snapshot of the state of the simulation right
+		after the applications of prefix (their encoding) were
+		scheduled. make_snapshot is called (without arguments)
+		to obtain it, only if there is no snapshot for prefix
+		yet and it was seen before. The snapshot must not be 
+		changed afterwards (the simulations that use it make 
+		copies).
+		"""
+		key = self.key(parameters, prefix)
+		if key in self.snapshots:
+			self.snapshots.move_to_end(key)
+			return
+		if not (key in self.seen):
+			self.seen[key] = None
+			if len(self.seen) > self.capacity:
+				self.seen.popitem(last=False)
+			return
+		del self.seen[key]
+		self.snapshots[key] = make_snapshot()
+		if len(self.snapshots) > self.capacity:
+			self.snapshots.popitem(last=False)
+			self.evictions += 1
+
+	def record(self, instrumentation):
+		"""
+		Adds the counters of this object to an Instrumentation
+		(as "memo_hits", "memo_misses", "memo_skipped_apps" and
+		"memo_evictions") and resets them.
+		"""
+		instrumentation.count("memo_hits", self.hits)
+		instrumentation.count("memo_misses", self.misses)
+		instrumentation.count("memo_skipped_apps", self.skipped_apps)
+		instrumentation.count("memo_evictions", self.evictions)
+		self.hits = 0
+		self.misses = 0
+		self.skipped_apps = 0
+		self.evictions = 0
@@ -0,0 +1,181 @@
+import contextlib
+import io
+import itertools
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from generate_queues import make_config, load_inputs, run
+
+####### PARAMETERS #####
+grid = {"node_nb" : [96],
+    "ion_nb" : [12],
+    "minimum_time" : [900, 1800],
+    "summary_method" : ["median"]}
+            #the configurations of the sweep are all
+            #combinations of these values. Any parameter of
+            #generate_queues.py can be used
+base = {"queue_nb" : 1000} #the other parameters of generate_queues.py,
+            #the same for every configuration (the ones that
+            #are not given keep their values in
+            #generate_queues.py)
+output_dir = "sweep"  #where the output of each configuration and the
+            #index are written
+index_file = "index.json"  #in output_dir, a summary of the sweep with
+            #the parameters, the output file, the number of
+            #queues and the time of each configuration
+worker_nb = os.cpu_count() #number of processes running configurations.
+            #Each configuration is generated by a single process
+share_decisions = True #if True, the decisions of the MCKP are kept and
+            #shared by the configurations with the same input
+            #files, ion_nb and mckp_policy run by the same process
+            #(see DecisionTable with lazy=True), so each set of
+            #running applications is only solved once. The
+            #results are the same
+########################
+
+#the inputs (applications and Bandwidth) of each group of
+#configurations with the same input files (see input_key), and the
+#shared DecisionTable of each group with the same decisions (see
+#decision_key), in each process. They are set by init_sweep_worker
+sweep_inputs = {}
+sweep_tables = {}
+sweep_shared = False
+
+#configurations with the same input_key use the same applications and
+#Bandwidth (see load_inputs)
+def input_key(config):
+    return (config["input_file"], config["catalog_cache"], config["summary_method"])
+
+#configurations with the same decision_key get the same decisions from
+#the MCKP (it does not depend on node_nb)
+def decision_key(config):
+    return input_key(config) + (config["ion_nb"], config["mckp_policy"])
+
+#returns the name of the output of a configuration, made of the values
+#it takes from the grid (a dict)
+def configuration_name(point):
+    return "_".join([name+"-"+str(point[name]) for name in point])
+
+#returns the configurations of the sweep (see make_config), one per
+#combination of the values of grid (a dict relating parameters to lists
+#of values), in order. The other parameters come from base (a dict).
+#Each configuration writes to its own files in output_dir and is
+#generated by a single process
+def make_configurations(grid, base, output_dir):
+    configs = []
+    names = list(grid.keys())
+    for values in itertools.product(*[grid[name] for name in names]):
+        point = dict(zip(names, values))
+        config = make_config(**base)
+        config.update(point)
+        config["worker_nb"] = 1
+        if config["output_format"] == "npy":
+            extension = ".npy"
+        else:
+            extension = ".csv"
+        prefix = os.path.join(output_dir, configuration_name(point))
+        config["output_file"] = prefix+extension
+        config["report_file"] = prefix+".instrumentation.json"
+        if config["checkpoint_file"] is not None:
+            config["checkpoint_file"] = prefix+".checkpoint.json"
+        configs.append((point, config))
+    return configs
+
+#called once in each process of the sweep, with the inputs of every
+#group of configurations (a dict relating each input_key to the
+#applications and the Bandwidth)
+def init_sweep_worker(inputs, shared):
+    global sweep_inputs, sweep_tables, sweep_shared
+    sweep_inputs = inputs
+    sweep_tables = {}
+    sweep_shared = shared
+
+#generates the queues of a configuration with the inputs of this
+#process, and returns its entry of the index: the number of queues and
+#the time it took. The messages printed by generate_queues.py are not
+#shown, since several configurations run at the same time. If the 
+#configuration fails, the error (the traceback, or the last message if
+#it stops the program, as Bandwidth.missing does) is given as "error" 
+#and the other configurations go on
+def run_configuration(config):
+    from decision_table import DecisionTable
+    start = time.perf_counter()
+    apps, band_getter = sweep_inputs[input_key(config)]
+    decision_table = None
+    if sweep_shared:
+        key = decision_key(config)
+        if not (key in sweep_tables):
+            sweep_tables[key] = DecisionTable(apps, config["node_nb"], config["ion_nb"], band_getter, config["debug"], config["mckp_policy"], lazy=True)
+        decision_table = sweep_tables[key]
+    messages = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(messages):
+            queue_nb = run(config, apps, band_getter, decision_table)
+    except SystemExit:
+        return {"queue_nb" : None,
+            "elapsed" : time.perf_counter() - start,
+            "error" : messages.getvalue().strip().split("\n")[-1]}
+    except Exception:
+        return {"queue_nb" : None,
+            "elapsed" : time.perf_counter() - start,
+            "error" : traceback.format_exc()}
+    return {"queue_nb" : queue_nb,
+        "elapsed" : time.perf_counter() - start}
+
+#prints a line about a finished configuration
+def report_configuration(point, result):
+    if "error" in result:
+        print("failed: "+configuration_name(point)+"\n"+result["error"], flush=True)
+    else:
+        print("done: "+configuration_name(point)+" ("+str(result["queue_nb"])+" queues in "+("%.1f" % result["elapsed"])+"s)", flush=True)
+
+#runs the configurations (a list of (point, config) as returned by
+#make_configurations) with worker_nb processes and writes the index to
+#index_path. The input files of each group of configurations are read
+#only once, by this process, and given to the workers. Returns the
+#index (a list with one entry per configuration, in order)
+def sweep(configs, worker_nb, index_path, shared=True):
+    start = time.perf_counter()
+    inputs = {}
+    for point, config in configs:
+        if not (input_key(config) in inputs):
+            with contextlib.redirect_stdout(io.StringIO()):
+                inputs[input_key(config)] = load_inputs(config)
+    for point, config in configs:
+        directory = os.path.dirname(config["output_file"])
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+    if worker_nb > 1:
+        executor = ProcessPoolExecutor(max_workers=worker_nb, initializer=init_sweep_worker, initargs=(inputs, shared))
+        try:
+            futures = [executor.submit(run_configuration, config) for point, config in configs]
+            results = []
+            for (point, config), future in zip(configs, futures):
+                results.append(future.result())
+                report_configuration(point, results[-1])
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    else:
+        init_sweep_worker(inputs, shared)
+        results = []
+        for point, config in configs:
+            results.append(run_configuration(config))
+            report_configuration(point, results[-1])
+    index = []
+    for (point, config), result in zip(configs, results):
+        entry = {"parameters" : point,
+            "output_file" : config["output_file"]}
+        entry.update(result)
+        index.append(entry)
+    arq = open(index_path, "w")
+    json.dump({"elapsed" : time.perf_counter() - start,
+        "configurations" : index}, arq, indent=1)
+    arq.close()
+    return index
+
+if __name__ == "__main__":
+    configs = make_configurations(grid, base, output_dir)
+    index = sweep(configs, min(worker_nb, len(configs)), os.path.join(output_dir, index_file), share_decisions)
+    print("Wrote "+str(len(index))+" configurations, see "+os.path.join(output_dir, index_file))
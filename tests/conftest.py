@@ -0,0 +1,23 @@
+import contextlib
+import io
+import os
+import sys
+import pytest
+
+#the modules of the repository are not a package, and the input files
+#are found relative to the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+#the applications and the Bandwidth of the input files of the
+#repository (see load_inputs in generate_queues.py)
+@pytest.fixture(scope="session")
+def inputs():
+    from generate_queues import make_config, load_inputs
+    previous = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return load_inputs(make_config(catalog_cache=None))
+    finally:
+        os.chdir(previous)
@@ -0,0 +1,51 @@
+import contextlib
+import io
+from itertools import islice
+from random import seed
+import pytest
+from batch_simulation import simulate_batch
+from generate_queues import make_config,generate
+from job_queue import make_a_queue
+from policy_simulation import simulate_execution_with_policy
+from test_policy_simulation import METRIC_NAMES
+
+#simulating the queues together must give exactly the metrics of
+#simulating each of them
+@pytest.mark.parametrize("policy", ["baseline", "mckp", "sparse_mckp"])
+@pytest.mark.parametrize("exact_durations", [False, True])
+@pytest.mark.parametrize("node_nb,ion_nb,minimum_time", [(96, 12, 900), (192, 24, 1800)])
+def test_batch_simulation_is_the_same(inputs, policy, exact_durations, node_nb, ion_nb, minimum_time):
+    apps, band_getter = inputs
+    seed(minimum_time)
+    queues = [make_a_queue(apps, node_nb, minimum_time) for i in range(50)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        batch = simulate_batch(queues, node_nb, ion_nb, policy, band_getter, exact_durations=exact_durations)
+        for queue, metrics in zip(queues, batch):
+            eager = simulate_execution_with_policy(queue, node_nb, ion_nb, policy, band_getter, exact_durations=exact_durations)
+            for name in METRIC_NAMES:
+                assert getattr(metrics, name) == getattr(eager, name), name
+            assert metrics.bandwidth_getter is None
+
+#returns the output lines of the first queue_nb queues generated for
+#config, and the position given with each of them
+def generate_lines(inputs, queue_nb, **overrides):
+    apps, band_getter = inputs
+    config = make_config(queue_nb=queue_nb, random_seed=5, **overrides)
+    position = {}
+    lines = []
+    positions = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for new_queue in generate(config, apps, band_getter, position=position):
+            lines.append(new_queue.get_output_line(new_queue.encode()))
+            positions.append(dict(position))
+    return lines, positions
+
+#the generation gives the same queues, and the same positions for the
+#checkpoints, with the simulations done in batches
+@pytest.mark.parametrize("queue_filters", [[("mckp_metrics.median_njobs", ">=", 2)],
+    [("max_makespan", "<", 4000), ("baseline_metrics.mean_bandwidth", ">", 100)]])
+def test_generation_in_batches_is_the_same(inputs, queue_filters):
+    lines, positions = generate_lines(inputs, 60, queue_filters=queue_filters)
+    batch_lines, batch_positions = generate_lines(inputs, 60, queue_filters=queue_filters, batch_simulation=16)
+    assert batch_lines == lines
+    assert batch_positions == positions
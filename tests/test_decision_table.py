@@ -0,0 +1,56 @@
+import contextlib
+import io
+from random import Random,seed
+import pytest
+from decision_table import DecisionTable
+from job import Job
+from job_queue import make_a_queue
+from policy import mckp_policy
+from policy_simulation import simulate_execution_with_policy
+from test_policy_simulation import METRIC_NAMES
+
+#returns a random list of at most ion_nb jobs that fit in node_nb 
+#processing nodes
+def random_jobs(rng, apps, node_nb, ion_nb):
+    job_list = []
+    available_nodes = node_nb
+    for jobid in range(rng.randint(1, ion_nb)):
+        app = rng.choice(apps)
+        if app.nodes <= available_nodes:
+            job_list.append(Job(jobid, 0, app))
+            available_nodes -= app.nodes
+    return job_list
+
+#the decisions looked up in a DecisionTable (precomputed or lazy) must
+#be the ones of solving the same list of jobs with mckp_policy, and 
+#the global bandwidth the one obtained with them
+@pytest.mark.parametrize("lazy", [False, True])
+@pytest.mark.parametrize("node_nb,ion_nb", [(96, 8), (96, 12)])
+def test_table_lookup_is_the_same(inputs, lazy, node_nb, ion_nb):
+    apps, band_getter = inputs
+    decision_table = DecisionTable(apps, node_nb, ion_nb, band_getter, lazy=lazy)
+    rng = Random(ion_nb)
+    for i in range(500):
+        job_list = random_jobs(rng, apps, node_nb, ion_nb)
+        expected = mckp_policy(job_list, node_nb, ion_nb, band_getter)
+        decision, global_band, upper_bound = decision_table.lookup(job_list)
+        assert decision == expected
+        assert global_band == pytest.approx(sum([band_getter.get(job.app.app, job.app.nodes, job.app.procs, expected[job]) for job in job_list]), rel=1e-12)
+        assert upper_bound is None
+    if not lazy:
+        assert decision_table.misses == 0
+
+#the optimality gaps of greedy_mckp are kept when its decisions are
+#looked up in a DecisionTable
+def test_greedy_mckp_keeps_its_gaps_with_a_table(inputs):
+    apps, band_getter = inputs
+    decision_table = DecisionTable(apps, 96, 12, band_getter, policy="greedy_mckp", lazy=True)
+    seed(3)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(100):
+            queue = make_a_queue(apps, 96, 3600)
+            solved = simulate_execution_with_policy(queue, 96, 12, "greedy_mckp", band_getter)
+            looked_up = simulate_execution_with_policy(queue, 96, 12, "greedy_mckp", band_getter, decision_table=decision_table)
+            assert solved.max_gap >= 0
+            for name in METRIC_NAMES + ["gaps", "mean_gap", "max_gap"]:
+                assert getattr(looked_up, name) == getattr(solved, name), name
@@ -0,0 +1,45 @@
+from random import Random
+import pytest
+from job import Job
+from incremental_mckp import IncrementalMCKP
+from policy import mckp_policy
+
+#returns the decision of a solver for job_list, or None if its 
+#backtracking fails (as mckp_backtrack may)
+def decide(solver, job_list):
+    try:
+        return solver(job_list)
+    except KeyError:
+        return None
+
+#through random arrivals (at the end of the list of running jobs, as in
+#the simulation) and departures (from anywhere), each solve must give
+#the decisions of solving the same list from scratch with mckp_policy
+@pytest.mark.parametrize("trial", range(20))
+@pytest.mark.parametrize("ion_nb", [8, 12, 16])
+def test_incremental_mckp_is_the_same(inputs, trial, ion_nb):
+    apps, band_getter = inputs
+    rng = Random(trial)
+    solver = IncrementalMCKP(ion_nb, band_getter)
+    running = []
+    previous = []
+    jobid = 0
+    for step in range(50):
+        for departure in range(rng.randint(0, min(2, len(running)))):
+            del running[rng.randrange(len(running))]
+        for arrival in range(rng.randint(0, 3)):
+            if len(running) < min(ion_nb, 8):
+                running.append(Job(jobid, 0, rng.choice(apps)))
+                jobid += 1
+        if len(running) == 0:
+            continue
+        layers = solver.computed_layers
+        expected = decide(lambda job_list: mckp_policy(job_list, 96, ion_nb, band_getter), running)
+        assert decide(solver.solve, running) == expected
+        #only the layers after the prefix that did not change are
+        #computed
+        kept = 0
+        while (kept < min(len(previous), len(running))) and (previous[kept] is running[kept]):
+            kept += 1
+        assert solver.computed_layers - layers == len(running) - kept
+        previous = list(running)
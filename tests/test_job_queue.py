@@ -0,0 +1,26 @@
+from random import seed
+import pytest
+from job_queue import make_a_queue,make_a_covering_queue,calculate_makespan,are_all_applications_executed
+
+#a covering queue is the queue of make_a_queue (with the same random
+#numbers) followed by one job of each missing application, and it
+#overshoots min_time by less than the best runtimes of the last drawn
+#job and of the missing ones
+@pytest.mark.parametrize("node_nb,minimum_time", [(96, 900), (96, 3600), (192, 1800)])
+def test_covering_queues_are_as_described(inputs, node_nb, minimum_time):
+    apps, band_getter = inputs
+    for i in range(200):
+        seed(str(minimum_time)+":"+str(i))
+        drawn = make_a_queue(apps, node_nb, minimum_time)
+        seed(str(minimum_time)+":"+str(i))
+        queue = make_a_covering_queue(apps, node_nb, minimum_time)
+        assert queue[:len(drawn)] == drawn
+        missing = queue[len(drawn):]
+        assert len(set(missing)) == len(missing)
+        assert not (set(missing) & set(drawn))
+        assert are_all_applications_executed(queue, apps)
+        #the drawing stopped at the first job that reached min_time
+        assert calculate_makespan(drawn[:-1], node_nb, "best") < minimum_time
+        makespan = calculate_makespan(queue, node_nb, "best")
+        assert makespan >= minimum_time
+        assert makespan - minimum_time < sum([app.get_time("best") for app in [drawn[-1]] + missing])
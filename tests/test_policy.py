@@ -0,0 +1,72 @@
+from itertools import product
+from random import Random
+import pytest
+from job import Job
+from policy import MCKP_FORWARDERS,fill_mckp_tables,fill_mckp_tables_vectorized,mckp_backtrack,mckp_policy,sparse_mckp_policy
+
+#returns the decision of mckp_backtrack (None if it fails) and the value
+#of the best solution in the tables
+def solve(fill, values, weight, group_nb, ion_nb):
+    table, solution_table = fill(values, weight, group_nb, ion_nb)
+    try:
+        decision = mckp_backtrack(list(range(group_nb)), values, weight, solution_table, ion_nb)
+    except KeyError:
+        decision = None
+    return table, solution_table, decision, solution_table[group_nb - 1][len(MCKP_FORWARDERS) - 1].max()
+
+#both ways of filling the tables must give the same tables, decisions
+#and optimal values, for random values (as the integer bandwidths given
+#by mckp_job_options)
+@pytest.mark.parametrize("trial", range(200))
+def test_vectorized_mckp_tables_are_the_same(trial):
+    rng = Random(trial)
+    group_nb = rng.randint(1, 8)
+    ion_nb = rng.randint(1, 20)
+    values = {}
+    weight = {}
+    for group_id in range(group_nb):
+        values[group_id] = [rng.randint(1, 10**7) for ion in MCKP_FORWARDERS]
+        weight[group_id] = list(MCKP_FORWARDERS)
+    table, solution_table, decision, best = solve(fill_mckp_tables, values, weight, group_nb, ion_nb)
+    vectorized = solve(fill_mckp_tables_vectorized, values, weight, group_nb, ion_nb)
+    assert (vectorized[0] == table).all()
+    assert (vectorized[1] == solution_table).all()
+    assert vectorized[2] == decision
+    assert vectorized[3] == best
+    if decision is not None:
+        assert sum([values[i][weight[i].index(decision[i])] for i in decision]) == best
+
+#the same with the jobs of the input files, through mckp_policy
+def test_vectorized_mckp_policy_is_the_same(inputs):
+    apps, band_getter = inputs
+    rng = Random(0)
+    for trial in range(300):
+        jobs = [Job(jobid, 0, rng.choice(apps)) for jobid in range(rng.randint(1, 6))]
+        ion_nb = rng.choice([8, 12, 16])
+        assert mckp_policy(jobs, 96, ion_nb, band_getter, vectorized=True) == mckp_policy(jobs, 96, ion_nb, band_getter, vectorized=False)
+
+#returns the total bandwidth of the jobs with a decision
+def total_bandwidth(jobs, decision, band_getter):
+    return sum([band_getter.get(job.app.app, job.app.nodes, job.app.procs, decision[job]) for job in jobs])
+
+#sparse_mckp_policy must find the best solution among all options of
+#the catalog (found by enumerating them), so it gives at least the 
+#bandwidth of mckp_policy, which only has 1, 2, 4 and 8 I/O nodes
+def test_sparse_mckp_policy_is_optimal(inputs):
+    apps, band_getter = inputs
+    rng = Random(1)
+    for trial in range(300):
+        jobs = [Job(jobid, 0, rng.choice(apps)) for jobid in range(rng.randint(1, 5))]
+        ion_nb = rng.choice([8, 12, 16])
+        decision = sparse_mckp_policy(jobs, 96, ion_nb, band_getter)
+        assert sum(decision.values()) <= ion_nb
+        sparse = total_bandwidth(jobs, decision, band_getter)
+        options = [band_getter.get_options(job.app)[0] for job in jobs]
+        best = max([sum([band_getter.get(job.app.app, job.app.nodes, job.app.procs, int(ion)) for job,ion in zip(jobs, choice)])
+            for choice in product(*options) if sum(choice) <= ion_nb])
+        assert sparse == pytest.approx(best, rel=1e-12)
+        try:
+            expected = mckp_policy(jobs, 96, ion_nb, band_getter)
+        except KeyError:
+            continue
+        assert sparse >= total_bandwidth(jobs, expected, band_getter)*(1 - 1e-12)
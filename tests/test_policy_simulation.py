@@ -0,0 +1,58 @@
+import contextlib
+import io
+from random import seed
+import pytest
+from job_queue import make_a_queue
+from policy_simulation import simulate_execution_with_policy,simulate_execution_lazily
+
+#everything the Metrics of a simulation give
+METRIC_NAMES = ["policy_calls", "makespan", "changes", "period", "njobs",
+    "bandwidth", "bandwidth_durations", "median_period", "mean_period",
+    "median_njobs", "mean_njobs", "median_bandwidth", "mean_bandwidth",
+    "max_bandwidth", "total_njobs"]
+
+#the statistics of the Metrics that are compared between engines
+STATISTIC_NAMES = ["makespan", "median_period", "mean_period",
+    "median_njobs", "mean_njobs", "median_bandwidth", "mean_bandwidth",
+    "max_bandwidth"]
+
+#simulate_execution_lazily sums the progress of the jobs in fewer steps,
+#so it must match simulate_execution_with_policy up to rounding: the
+#makespan of every queue is the same to 1e-12 (relative), and when
+#both have the same events, so are the number of jobs and the changes
+#of every call, and the statistics to 1e-9. Two jobs that end at the
+#same time may end a few ulps apart in one of the engines, which adds
+#an event, so the number of events may differ by at most 2, in at most
+#5% of the queues
+@pytest.mark.parametrize("policy", ["baseline", "mckp"])
+@pytest.mark.parametrize("minimum_time", [900, 3600])
+def test_lazy_simulation_matches(inputs, policy, minimum_time):
+    apps, band_getter = inputs
+    seed(minimum_time)
+    queues = [make_a_queue(apps, 96, minimum_time) for i in range(100)]
+    different = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for queue in queues:
+            eager = simulate_execution_with_policy(queue, 96, 12, policy, band_getter)
+            lazy = simulate_execution_lazily(queue, 96, 12, policy, band_getter)
+            assert lazy.makespan == pytest.approx(eager.makespan, rel=1e-12)
+            if lazy.policy_calls != eager.policy_calls:
+                assert abs(lazy.policy_calls - eager.policy_calls) <= 2
+                different += 1
+                continue
+            assert lazy.njobs == eager.njobs
+            assert lazy.changes == eager.changes
+            for name in STATISTIC_NAMES:
+                assert getattr(lazy, name) == pytest.approx(getattr(eager, name), rel=1e-9), name
+    assert different <= 0.05*len(queues)
+
+#the final Metrics are pickled back from the worker processes, so they
+#must not keep the Bandwidth
+@pytest.mark.parametrize("summary_only", [False, True])
+def test_final_metrics_drop_the_bandwidth(inputs, summary_only):
+    apps, band_getter = inputs
+    seed(1)
+    queue = make_a_queue(apps, 96, 900)
+    with contextlib.redirect_stdout(io.StringIO()):
+        metrics = simulate_execution_with_policy(queue, 96, 12, "mckp", band_getter, summary_only=summary_only)
+    assert metrics.bandwidth_getter is None
@@ -0,0 +1,40 @@
+import contextlib
+import io
+from random import seed
+import pytest
+from job_queue import make_a_queue
+from policy_simulation import simulate_execution_with_policy
+from simulation_memo import SimulationMemo
+from test_policy_simulation import METRIC_NAMES
+
+#returns queues that share prefixes of different lengths: each one of a
+#few random queues, followed by its first applications with the tail of
+#another random queue
+def queues_with_common_prefixes(apps, node_nb, minimum_time):
+    queues = []
+    for i in range(10):
+        queue = make_a_queue(apps, node_nb, minimum_time)
+        queues.append(queue)
+        for length in range(1, len(queue), 2):
+            queues.append(queue[:length] + make_a_queue(apps, node_nb, minimum_time))
+    return queues
+
+#a simulation that starts from a snapshot of the memo must give exactly
+#the metrics of simulating the whole queue
+@pytest.mark.parametrize("policy", ["baseline", "mckp"])
+@pytest.mark.parametrize("stride", [1, 3])
+@pytest.mark.parametrize("summary_only", [False, True])
+def test_memo_resumed_simulation_is_the_same(inputs, policy, stride, summary_only):
+    apps, band_getter = inputs
+    seed(stride)
+    queues = queues_with_common_prefixes(apps, 96, 1800)
+    memo = SimulationMemo(1000, stride)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for queue in queues:
+            fresh = simulate_execution_with_policy(queue, 96, 12, policy, band_getter, summary_only=summary_only)
+            for i in range(2):
+                resumed = simulate_execution_with_policy(queue, 96, 12, policy, band_getter, memo=memo, summary_only=summary_only)
+                for name in METRIC_NAMES:
+                    assert getattr(resumed, name) == getattr(fresh, name), name
+    assert memo.hits > 0
+    assert memo.skipped_apps > 0
@@ -0,0 +1,64 @@
+import contextlib
+import io
+from random import Random,seed
+import numpy
+import pytest
+from job_queue import make_a_queue
+from metrics import weighted_median
+from policy_simulation import simulate_execution_with_policy
+from quantile_sketch import QuantileSketch
+
+#the medians of the summaries, and the exact ones they are compared to
+MEDIAN_NAMES = ["median_period", "median_njobs", "median_bandwidth"]
+
+#the means and maxima of the summaries, which are the same as the exact
+#ones apart from the last digits
+SUMMED_NAMES = ["mean_period", "mean_njobs", "mean_bandwidth", "max_bandwidth"]
+
+#the medians of a sketch are exact while there are at most 2*size
+#distinct values, and at most the error bound away from the exact
+#weighted median above that
+@pytest.mark.parametrize("trial", range(50))
+def test_sketch_median_is_within_its_bound(trial):
+    rng = Random(trial)
+    size = rng.choice([4, 16, 100])
+    distinct = rng.randint(1, 6*size)
+    choices = [rng.uniform(0, 1000) for i in range(distinct)]
+    values = []
+    weights = []
+    sketch = QuantileSketch(size)
+    for i in range(rng.randint(1, 2000)):
+        values.append(rng.choice(choices))
+        weights.append(rng.randint(1, 50))
+        sketch.add(values[-1], weights[-1])
+    exact = weighted_median(numpy.array(values), numpy.array(weights))
+    estimate, error = sketch.median()
+    if len(set(values)) <= 2*size:
+        assert error == 0
+        assert estimate == exact
+    else:
+        assert abs(estimate - exact) <= error*(1 + 1e-12)
+    assert sketch.mean() == pytest.approx(numpy.average(values, weights=weights), rel=1e-9)
+    assert sketch.maximum == max(values)
+
+#the Metrics of a simulation with summary_only must be the ones of the
+#same simulation with the lists (see Metrics)
+@pytest.mark.parametrize("policy", ["baseline", "mckp", "greedy_mckp"])
+@pytest.mark.parametrize("exact_durations", [False, True])
+def test_summary_metrics_are_the_same(inputs, policy, exact_durations):
+    apps, band_getter = inputs
+    seed(4)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(50):
+            queue = make_a_queue(apps, 96, 3600)
+            full = simulate_execution_with_policy(queue, 96, 12, policy, band_getter, exact_durations=exact_durations)
+            summary = simulate_execution_with_policy(queue, 96, 12, policy, band_getter, exact_durations=exact_durations, summary_only=True)
+            assert full.total_njobs == sum(full.njobs)
+            for name in ["policy_calls", "makespan", "changes", "total_njobs"]:
+                assert getattr(summary, name) == getattr(full, name), name
+            for name in SUMMED_NAMES + ["mean_gap", "max_gap"]:
+                assert getattr(summary, name) == pytest.approx(getattr(full, name), rel=1e-9), name
+            for name in MEDIAN_NAMES:
+                assert abs(getattr(summary, name) - getattr(full, name)) <= getattr(summary, name+"_error"), name
+            for name in ["period", "njobs", "bandwidth", "bandwidth_durations", "gaps"]:
+                assert getattr(summary, name) is None, name